@@ -1,6 +1,6 @@
 import streamlit as st
 import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import json
 import bcrypt
 import sys
@@ -13,21 +13,27 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 import streamlit as st
+import threading
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from core.web_search import duckduckgo_search
 
 # This comment is added to force Streamlit to clear its cache.
 
-from config.settings import APP_TITLE, APP_ICON
+from config.settings import APP_TITLE, APP_ICON, PHASH_MAX_DISTANCE, WEATHER_PREFETCH, STAGE_TIMING_ENABLED, HISTORY_PAGE_SIZE, DASHBOARD_RECENT_ANALYSES, THUMBNAIL_SIZE
 from config.database import init_db # Import init_db
 from components.sidebar import create_sidebar
 from components.image_upload import image_upload_component
 from components.analysis_display import analysis_display_component
 from core.disease_analyzer import DiseaseAnalyzer
 from core.recommendation_engine import RecommendationEngine
+from core.perceptual_index import PerceptualHashIndex
 from services.database_service import DatabaseService
 from services.image_service import ImageService
+from services.trend_service import TrendService
 from models.analysis import Analysis
 from models.user import User
+from utils.helpers import load_keyset_pages, load_more_button, reset_keyset_pages
+from utils.timing import StageTimer
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -38,10 +44,15 @@ st.set_page_config(
 )
 
 # --- Initialize Services ---
+def current_session_key():
+    # Streamlit session id, so read-your-writes holds across the reruns of one browser session
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else threading.get_ident()
+
 @st.cache_resource
 def get_database_service():
     init_db()
-    return DatabaseService()
+    return DatabaseService(session_key=current_session_key)
 
 @st.cache_resource
 def get_disease_analyzer():
@@ -55,10 +66,22 @@ def get_recommendation_engine():
 def get_image_service():
     return ImageService()
 
+@st.cache_resource
+def get_phash_index():
+    index = PerceptualHashIndex(max_distance=PHASH_MAX_DISTANCE)
+    index.add_many(get_database_service().get_analysis_phashes())
+    return index
+
+@st.cache_resource
+def get_trend_service():
+    return TrendService(get_database_service())
+
 db_service = get_database_service()
 disease_analyzer = get_disease_analyzer()
 recommendation_engine = get_recommendation_engine()
 image_service = get_image_service()
+phash_index = get_phash_index()
+trend_service = get_trend_service()
 
 # --- Session State Management ---
 if 'current_analysis' not in st.session_state:
@@ -151,6 +174,8 @@ def main():
         st.session_state.current_analysis = None
         st.session_state.current_recommendations = []
         st.session_state.raw_gemini_recommendation_response = None
+        reset_keyset_pages("history_pages")
+        reset_keyset_pages("forum_pages")
         st.rerun()
         return
 
@@ -174,13 +199,19 @@ def main():
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Son Analizler")
-            recent_analyses = db_service.get_analyses_by_user_id(st.session_state.user_id)
+            recent_analyses, _ = db_service.get_analyses_page(st.session_state.user_id, limit=DASHBOARD_RECENT_ANALYSES)
             if recent_analyses:
-                for i, analysis in enumerate(recent_analyses[:5]):
+                for i, analysis in enumerate(recent_analyses):
                     display_date = analysis.analysis_date.strftime('%Y-%m-%d %H:%M') if analysis.analysis_date else "Bilinmiyor"
-                    st.markdown(f"**Analiz #{len(recent_analyses) - i}: {display_date}**")
-                    st.write(f"Tespit Edilen Hastalık: {analysis.disease_detected}")
-                    st.write(f"Güven Skoru: {analysis.confidence_score:.2f}")
+                    col_thumbnail, col_details = st.columns([1, 3])
+                    with col_thumbnail:
+                        thumbnail = image_service.get_thumbnail(analysis.image_path)
+                        if thumbnail:
+                            st.image(thumbnail, use_container_width=True)
+                    with col_details:
+                        st.markdown(f"**Analiz #{dashboard_stats['total_analyses'] - i}: {display_date}**")
+                        st.write(f"Tespit Edilen Hastalık: {analysis.disease_detected}")
+                        st.write(f"Güven Skoru: {analysis.confidence_score:.2f}")
                     st.markdown("--- ")
             else:
                 st.info("Henüz bir analiz yapılmadı.")
@@ -191,20 +222,60 @@ def main():
 
         st.markdown("--- ")
         st.subheader("📈 Hastalık Trend Grafikleri")
-        st.info("Hastalık trend grafikleri ve genel istatistikler burada görüntülenecektir.")
+        col_range, col_granularity, col_group = st.columns([2, 1, 1])
+        with col_range:
+            trend_range = st.date_input("Tarih aralığı", value=(date.today() - timedelta(days=90), date.today()), key="trend_range")
+        with col_granularity:
+            granularity_label = st.radio("Dönem", ["Günlük", "Haftalık"], index=1, key="trend_granularity")
+        with col_group:
+            group_label = st.radio("Gruplama", ["Hastalık", "Güven bandı"], key="trend_group")
+        if isinstance(trend_range, (list, tuple)) and len(trend_range) == 2:
+            trend_series = trend_service.get_trend_series(
+                st.session_state.user_id, trend_range[0], trend_range[1],
+                granularity="day" if granularity_label == "Günlük" else "week",
+                group_by="disease" if group_label == "Hastalık" else "confidence_band"
+            )
+            if trend_series.empty or trend_series.columns.empty:
+                st.info("Seçilen tarih aralığında analiz bulunmamaktadır.")
+            else:
+                st.bar_chart(trend_series)
+        else:
+            st.info("Lütfen bir başlangıç ve bitiş tarihi seçin.")
 
     elif page == "Image Analysis":
         st.header("📷 Görüntü Analizi")
-        image_data, image_name, image_mime_type = image_upload_component()
+        image_file, image_name, image_mime_type = image_upload_component()
 
-        if st.button("Analizi Başlat") and image_data is not None:
+        reuse_similar = st.checkbox("Benzer bir görüntü daha önce analiz edildiyse önceki sonucu kullan", value=True)
+
+        if st.button("Analizi Başlat") and image_file is not None:
             with st.spinner("Görüntü analiz ediliyor..."):
+                timer = StageTimer()
+                # Start the weather lookup now so it overlaps with the vision analysis
+                weather_future = recommendation_engine.prefetch_weather(timer) if WEATHER_PREFETCH else None
                 try:
-                    processed_image_data = image_service.resize_image(image_data, max_size=(1024, 1024))
-                    processed_image_data = image_service.convert_to_jpeg(processed_image_data)
-                    unique_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{image_name.replace(' ', '_') if image_name else 'uploaded_image.jpeg'}"
-                    saved_image_path = image_service.save_image(processed_image_data, unique_filename)
-                    analysis_result, raw_gemini_analysis_response = disease_analyzer.analyze_grape_image(processed_image_data, image_mime_type)
+                    with timer.stage("preprocess"):
+                        processed_image_data, processed_mime_type = image_service.preprocess(image_file, image_mime_type, max_size=(1024, 1024))
+                        saved_image_path = image_service.save_image(processed_image_data, image_name or 'uploaded_image.jpeg') # Stored once per distinct image
+                        image_phash = image_service.perceptual_hash(processed_image_data)
+                    with timer.stage("vision analysis"):
+                        similar = phash_index.find_nearest(image_phash) if reuse_similar else None
+                        similar_analysis = db_service.get_analysis_by_id(similar[0]) if similar else None
+                        if similar_analysis:
+                            st.info(f"Bu görüntü daha önce analiz edilen bir görüntüye çok benziyor (fark: {similar[1]} bit). Önceki sonuç kullanıldı.")
+                            analysis_result = {
+                                'disease_detected': similar_analysis.disease_detected,
+                                'confidence_score': similar_analysis.confidence_score,
+                                'detailed_description': similar_analysis.detailed_description,
+                                'possible_causes': similar_analysis.possible_causes,
+                                'immediate_actions': similar_analysis.immediate_actions
+                            }
+                            raw_gemini_analysis_response = similar_analysis.gemini_response
+                        else:
+                            analysis_result, raw_gemini_analysis_response = disease_analyzer.analyze_grape_image(processed_image_data, processed_mime_type)
+                            if raw_gemini_analysis_response is None:
+                                # Retries exhausted or circuit open: nothing is saved and no recommendations are generated
+                                raise RuntimeError("Yapay zeka servisi şu anda yanıt vermiyor, analiz kaydedilmedi. Lütfen biraz sonra tekrar deneyin.")
                     new_analysis = Analysis(
                         user_id=st.session_state.user_id,
                         image_path=saved_image_path,
@@ -213,16 +284,19 @@ def main():
                         gemini_response=raw_gemini_analysis_response,
                         detailed_description=analysis_result.get('detailed_description', None),
                         possible_causes=analysis_result.get('possible_causes', None),
-                        immediate_actions=analysis_result.get('immediate_actions', None)
+                        immediate_actions=analysis_result.get('immediate_actions', None),
+                        image_phash=f"{image_phash:016x}"
                     )
-                    analysis_id = db_service.add_analysis(new_analysis)
-                    if analysis_id is not None:
-                        new_analysis.id = analysis_id
+                    recommendations_list, raw_gemini_recommendation_response = recommendation_engine.generate_recommendations(new_analysis, weather_future=weather_future, timer=timer)
+                    # The analysis and its recommendations are written in one transaction
+                    with timer.stage("save analysis"):
+                        saved_ids = db_service.save_analysis_with_recommendations(new_analysis, recommendations_list)
+                    if saved_ids is not None:
+                        analysis_id = saved_ids[0]
+                        reset_keyset_pages("history_pages")
+                        if new_analysis.disease_detected != "Unknown":
+                            phash_index.add(analysis_id, image_phash)
                         st.session_state.current_analysis = new_analysis
-                        recommendations_list, raw_gemini_recommendation_response = recommendation_engine.generate_recommendations(new_analysis)
-                        for rec in recommendations_list:
-                            rec.analysis_id = analysis_id
-                            db_service.add_recommendation(rec)
                         st.session_state.current_recommendations = recommendations_list
                         st.session_state.raw_gemini_recommendation_response = raw_gemini_recommendation_response
                         st.success("Analiz tamamlandı!")
@@ -235,39 +309,65 @@ def main():
                     st.error(f"Analiz sırasında bir hata oluştu: {e}")
                     st.session_state.current_analysis = None
                     st.session_state.current_recommendations = []
+                if STAGE_TIMING_ENABLED:
+                    print(timer.summary())
 
         if st.session_state.current_analysis:
-            analysis_display_component(st.session_state.current_analysis, st.session_state.current_recommendations)
-        elif image_data is None:
+            analysis_display_component(st.session_state.current_analysis, st.session_state.current_recommendations, db_service=db_service)
+        elif image_file is None:
             st.info("Lütfen bir görüntü yükleyin veya kamera ile çekin.")
 
     elif page == "History":
         st.header("📋 Geçmiş Analizler")
-        if st.session_state.user_id is not None:
-            user_analyses = db_service.get_analyses_by_user_id(st.session_state.user_id)
+        next_cursor = None
+        search_query = st.text_input("🔎 Analizlerde ara", placeholder="Hastalık, belirti, öneri...", key="history_search").strip()
+        snippets = {}
+        # Recommendations and follow-ups come in bulk, not two queries per analysis
+        fetch_history_page = lambda cursor: db_service.get_analyses_with_details(st.session_state.user_id, HISTORY_PAGE_SIZE, cursor)
+        if st.session_state.user_id is not None and search_query:
+            reset_keyset_pages("history_pages") # Clearing the search starts the list over
+            # Full-text search over the user's analyses and recommendations, best match first
+            hits = db_service.search_analyses(st.session_state.user_id, search_query, limit=HISTORY_PAGE_SIZE)
+            snippets = {hit['analysis_id']: hit['snippet'] for hit in hits}
+            analysis_ids = list(snippets)
+            recommendations_by_id = db_service.get_recommendations_for_analyses(analysis_ids)
+            follow_ups_by_id = db_service.get_follow_ups_for_analyses(analysis_ids)
+            user_analyses = [(analysis, recommendations_by_id.get(analysis.id, []), follow_ups_by_id.get(analysis.id, []))
+                             for analysis in db_service.get_analyses_by_ids(analysis_ids)]
+            if not user_analyses:
+                st.info(f"'{search_query}' için sonuç bulunamadı.")
+        elif st.session_state.user_id is not None:
+            user_analyses, next_cursor = load_keyset_pages("history_pages", fetch_history_page)
+            total_analyses = db_service.get_dashboard_stats(st.session_state.user_id)["total_analyses"]
         else:
             user_analyses = []
             st.warning("Kullanıcı ID'si bulunamadı. Lütfen giriş yapın.")
 
         if user_analyses:
-            st.write("Son analizleriniz:")
-            for i, analysis in enumerate(user_analyses):
-                recommendations = db_service.get_recommendations_by_analysis_id(analysis.id) if analysis.id else []
+            st.write("Arama sonuçları:" if search_query else "Son analizleriniz:")
+            for i, (analysis, recommendations, follow_ups) in enumerate(user_analyses):
                 display_date = analysis.analysis_date.strftime('%Y-%m-%d %H:%M') if analysis.analysis_date else "Bilinmiyor"
-                with st.expander(f"Analiz #{len(user_analyses) - i}: {display_date} - {analysis.disease_detected}"):
-                    analysis_display_component(analysis, recommendations)
-                    if analysis.gemini_response:
-                        st.subheader("📝 AI Açıklaması (Türkçe)")
-                        st.info(analysis.gemini_response)
+                title = f"{display_date} - {analysis.disease_detected}" if search_query else f"Analiz #{total_analyses - i}: {display_date} - {analysis.disease_detected}"
+                with st.expander(title):
+                    thumbnail = image_service.get_thumbnail(analysis.image_path) # Small stored copy, not the full image
+                    if thumbnail:
+                        st.image(thumbnail, width=THUMBNAIL_SIZE[0])
+                    if analysis.id in snippets:
+                        st.markdown(f"🔎 {snippets[analysis.id]}")
+                    analysis_display_component(analysis, recommendations, follow_ups, db_service=db_service)
 
                     # Add a delete button for the analysis
                     if st.button(f"Analizi Sil (ID: {analysis.id})", key=f"delete_analysis_{analysis.id}", type="secondary"):
                         if db_service.delete_analysis(analysis.id):
+                            phash_index.remove(analysis.id)
+                            reset_keyset_pages("history_pages")
                             st.success(f"Analiz ID: {analysis.id} başarıyla silindi.")
                             st.session_state.current_analysis = None # Clear current analysis if it was deleted
                             st.rerun()
                         else:
                             st.error(f"Analiz ID: {analysis.id} silinirken bir hata oluştu.")
+            if next_cursor is not None:
+                load_more_button("history_pages", fetch_history_page, "Daha fazla analiz yükle")
         else:
             st.info("Henüz bir analiz geçmişiniz bulunmamaktadır.")
 
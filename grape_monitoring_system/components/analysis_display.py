@@ -2,13 +2,24 @@ import streamlit as st
 from models.analysis import Analysis
 from models.recommendation import Recommendation
 from components.recommendation_card import recommendation_card
+from utils.helpers import reset_keyset_pages
 from services.database_service import DatabaseService
 from datetime import datetime
+from typing import Optional
 import json
 
-db_service = DatabaseService()
+_default_db_service = None
 
-def analysis_display_component(analysis: Analysis, recommendations: list[Recommendation]):
+def analysis_display_component(analysis: Analysis, recommendations: list[Recommendation], follow_ups: Optional[list[dict]] = None, db_service: Optional[DatabaseService] = None):
+    """
+    Pass follow_ups when they were already loaded in bulk (History page); otherwise they are queried here.
+    Pass the app's db_service so follow-up writes share its pool and write-behind queue.
+    """
+    global _default_db_service
+    if db_service is None:
+        if _default_db_service is None:
+            _default_db_service = DatabaseService()
+        db_service = _default_db_service
     st.header("🔬 Analiz Sonuçları")
     if analysis:
         st.subheader("Tespit Edilen Hastalık")
@@ -74,16 +85,23 @@ def analysis_display_component(analysis: Analysis, recommendations: list[Recomme
             st.info("Bu analiz için henüz bir öneri bulunmamaktadır.")
 
         # Display the raw Gemini response for debugging and full context
-        if analysis.gemini_response:
+        if analysis.gemini_response or analysis.id:
             with st.expander("Tam AI Yanıtı (Geliştirici Notu)"):
-                st.code(analysis.gemini_response, language='json') # Try to display as JSON, falls back to text
+                gemini_response = analysis.gemini_response
+                # History pages don't load the compressed raw response; read and decompress it only on request
+                if gemini_response is None and st.checkbox("Yanıtı göster", key=f"show_gemini_response_{analysis.id}"):
+                    gemini_response = db_service.get_gemini_response(analysis.id) or "Bu analiz için kayıtlı AI yanıtı yok."
+                if gemini_response:
+                    st.code(gemini_response, language='json') # Try to display as JSON, falls back to text
 
         st.markdown("--- ")
         st.subheader("📝 Takip Notları")
         follow_up_notes = st.text_area("Bu analizle ilgili not ekle:", key=f"follow_up_note_{analysis.id}")
         if st.button("Takip Notu Ekle", key=f"add_follow_up_{analysis.id}"):
             if follow_up_notes and analysis.id:
-                db_service.add_follow_up(analysis.id, "pending", follow_up_notes)
+                # No id needed here: don't block on the commit, the rerun below reads it back after it lands
+                db_service.add_follow_up(analysis.id, "pending", follow_up_notes, wait=False)
+                reset_keyset_pages("history_pages") # The History list holds this analysis' follow-ups
                 st.success("Takip notu başarıyla eklendi!")
                 st.rerun()
             else:
@@ -91,7 +109,8 @@ def analysis_display_component(analysis: Analysis, recommendations: list[Recomme
         
         st.markdown("**Mevcut Takip Notları:**")
         if analysis.id:
-            follow_ups = db_service.get_follow_ups_by_analysis_id(analysis.id)
+            if follow_ups is None:
+                follow_ups = db_service.get_follow_ups_by_analysis_id(analysis.id)
             if follow_ups:
                 for fu in follow_ups:
                     st.markdown(f"- **{fu.get('follow_up_date', 'Bilinmiyor')}** ({fu.get('status', 'Bilinmiyor')}): {fu.get('notes', '')}")
@@ -1,13 +1,23 @@
 import streamlit as st
 from services.database_service import DatabaseService
+from config.settings import FORUM_PAGE_SIZE
+from utils.helpers import load_keyset_pages, load_more_button, reset_keyset_pages
 from datetime import datetime
+from typing import Optional
 
 def community_forum_component(db_service: DatabaseService, user_id: int):
     st.header("💬 Topluluk Forumu")
 
     # Display existing questions
     st.subheader("Sorular")
-    questions = db_service.get_questions()
+    search_query = st.text_input("🔎 Forumda ara", placeholder="Soru veya cevaplarda geçen kelimeler...", key="forum_search").strip()
+    next_cursor = None
+    fetch_questions_page = lambda cursor: db_service.get_questions_page(FORUM_PAGE_SIZE, cursor)
+    if search_query:
+        questions = db_service.search_forum(search_query, limit=FORUM_PAGE_SIZE)
+        reset_keyset_pages("forum_pages") # Clearing the search starts the list over
+    else:
+        questions, next_cursor = load_keyset_pages("forum_pages", fetch_questions_page)
 
     # Question Submission Form
     with st.expander("Yeni Soru Sor", expanded=False):
@@ -22,52 +32,67 @@ def community_forum_component(db_service: DatabaseService, user_id: int):
                 else:
                     added_id = db_service.add_question(user_id, question_title, question_text)
                     if added_id:
+                        reset_keyset_pages("forum_pages")
                         st.success("Sorunuz başarıyla eklendi!")
                         st.rerun()
                     else:
                         st.error("Sorunuz eklenirken bir hata oluştu.")
 
-    if questions:
+    if search_query:
+        if questions:
+            for q in questions:
+                _question_expander(db_service, user_id, q, q['snippet'])
+        else:
+            st.info(f"'{search_query}' için sonuç bulunamadı.")
+    elif questions:
         for q in questions:
-            display_date = q['created_at'] if q['created_at'] else "Bilinmiyor"
-            if isinstance(display_date, str):
-                try:
-                    display_date = datetime.strptime(display_date, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
-                except ValueError:
-                    pass # Keep as is if parsing fails
-            
-            with st.expander(f"**{q['title']}** - {q['user_name']} ({display_date})"):
-                st.write(q['question_text'])
-                st.markdown("--- ")
-                st.subheader("Cevaplar")
-                answers = db_service.get_answers_for_question(q['id'])
-                if answers:
-                    for a in answers:
-                        answer_display_date = a['created_at'] if a['created_at'] else "Bilinmiyor"
-                        if isinstance(answer_display_date, str):
-                            try:
-                                answer_display_date = datetime.strptime(answer_display_date, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
-                            except ValueError:
-                                pass # Keep as is if parsing fails
-                        st.markdown(f"**{a['user_name']}** ({answer_display_date}): {a['answer_text']}")
-                    st.markdown("--- ")
-                else:
-                    st.info("Henüz bir cevap yok.")
+            _question_expander(db_service, user_id, q)
+        if next_cursor is not None:
+            load_more_button("forum_pages", fetch_questions_page, "Daha fazla soru yükle")
+    else:
+        st.info("Henüz soru sorulmamış.")
 
-                # Answer Submission Form
-                with st.form(key=f'answer_form_{q['id']}'):
-                    answer_text = st.text_area("Cevabınızı Yazın", key=f"answer_text_{q['id']}")
-                    submit_answer = st.form_submit_button("Cevapla")
+def _question_expander(db_service: DatabaseService, user_id: int, q: dict, snippet: Optional[str] = None):
+    """Shows one question with its answers and an answer form; snippet highlights a search match."""
+    display_date = q['created_at'] if q['created_at'] else "Bilinmiyor"
+    if isinstance(display_date, str):
+        try:
+            display_date = datetime.strptime(display_date, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
+        except ValueError:
+            pass # Keep as is if parsing fails
+    
+    with st.expander(f"**{q['title']}** - {q['user_name']} ({display_date})"):
+        if snippet:
+            st.markdown(f"🔎 {snippet}")
+        st.write(q['question_text'])
+        st.markdown("--- ")
+        st.subheader("Cevaplar")
+        answers = db_service.get_answers_for_question(q['id'])
+        if answers:
+            for a in answers:
+                answer_display_date = a['created_at'] if a['created_at'] else "Bilinmiyor"
+                if isinstance(answer_display_date, str):
+                    try:
+                        answer_display_date = datetime.strptime(answer_display_date, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')
+                    except ValueError:
+                        pass # Keep as is if parsing fails
+                st.markdown(f"**{a['user_name']}** ({answer_display_date}): {a['answer_text']}")
+            st.markdown("--- ")
+        else:
+            st.info("Henüz bir cevap yok.")
 
-                    if submit_answer:
-                        if not answer_text:
-                            st.warning("Lütfen cevabınızı girin.")
-                        else:
-                            added_id = db_service.add_answer(q['id'], user_id, answer_text)
-                            if added_id:
-                                st.success("Cevabınız eklendi!")
-                                st.rerun()
-                            else:
-                                st.error("Cevabınız eklenirken bir hata oluştu.")
-    else:
-        st.info("Henüz soru sorulmamış.") 
\ No newline at end of file
+        # Answer Submission Form
+        with st.form(key=f'answer_form_{q['id']}'):
+            answer_text = st.text_area("Cevabınızı Yazın", key=f"answer_text_{q['id']}")
+            submit_answer = st.form_submit_button("Cevapla")
+
+            if submit_answer:
+                if not answer_text:
+                    st.warning("Lütfen cevabınızı girin.")
+                else:
+                    added_id = db_service.add_answer(q['id'], user_id, answer_text)
+                    if added_id:
+                        st.success("Cevabınız eklendi!")
+                        st.rerun()
+                    else:
+                        st.error("Cevabınız eklenirken bir hata oluştu.")
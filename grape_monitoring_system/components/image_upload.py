@@ -1,6 +1,21 @@
 import streamlit as st
 from PIL import Image
 import io
+from config.settings import UPLOAD_PREVIEW_SIZE
+from utils.image_utils import preprocess_image
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _upload_preview(file_id: str, _image_file) -> bytes:
+    """
+    Downscaled copy of an upload for display; the full image is only used for the analysis.
+    Cached by the upload's id, so reruns don't hash the whole file.
+    """
+    try:
+        return preprocess_image(_image_file, max_size=UPLOAD_PREVIEW_SIZE, target_format="JPEG")
+    except Exception as e:
+        print(f"Error creating upload preview: {e}")
+        _image_file.seek(0)
+        return _image_file.read()
 
 def image_upload_component():
     st.header("📷 Görüntü Yükle")
@@ -9,20 +24,22 @@ def image_upload_component():
 
     camera_image = st.camera_input("Veya kameradan görüntü çek")
 
-    image_data = None
+    # The upload itself is returned (a file object over Streamlit's buffer) rather than read():
+    # preprocessing decodes it in place, so no extra copy of a large photo is made per user
+    image_file = None
     image_name = None
     image_mime_type = None
 
     if uploaded_file is not None:
-        image_data = uploaded_file.read()
+        image_file = uploaded_file
         image_name = uploaded_file.name
         image_mime_type = uploaded_file.type
-        st.image(image_data, caption='Yüklenen Görüntü', use_container_width=True)
+        st.image(_upload_preview(uploaded_file.file_id, uploaded_file), caption='Yüklenen Görüntü', use_container_width=True)
     elif camera_image is not None:
-        image_data = camera_image.read()
+        image_file = camera_image
         image_name = f"camera_capture_{len(st.session_state.get('analyses', [])) + 1}.jpeg"
         image_mime_type = "image/jpeg" # Camera input usually provides JPEG
-        st.image(image_data, caption='Kameradan Çekilen Görüntü', use_container_width=True)
+        st.image(_upload_preview(camera_image.file_id, camera_image), caption='Kameradan Çekilen Görüntü', use_container_width=True)
     
-    return image_data, image_name, image_mime_type
+    return image_file, image_name, image_mime_type
 
@@ -1,13 +1,368 @@
 import sqlite3
 import os
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from utils.buckets import confidence_band_sql
+from config.settings import SQLITE_BUSY_TIMEOUT_MS, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KIB, SQLITE_POOL_SIZE, SQLITE_POOL_TIMEOUT_SECONDS
 
 DATABASE_NAME = 'data/database.db' # Corrected relative path
 
-def init_db():
+def connect(db_path: Optional[str] = None, check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Opens a connection with the settings every part of the app relies on:
+    WAL journal (readers don't block the writer), a busy timeout and tuned synchronous/cache pragmas.
+    """
+    conn = sqlite3.connect(db_path or DATABASE_NAME, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_SIZE_KIB)}")
+    return conn
+
+class ConnectionPool:
+    """
+    Fixed-size pool of connections shared by Streamlit's script threads.
+    Connections are opened lazily and handed to one thread at a time; a thread that finds
+    the pool exhausted waits up to timeout seconds for a connection to be returned, then gets
+    sqlite3.OperationalError (a leaked connection or nested use must not hang a script thread).
+    close_all() closes idle connections at once and checked-out ones when they are returned.
+    """
+    def __init__(self, db_path: Optional[str] = None, size: int = SQLITE_POOL_SIZE, timeout: float = SQLITE_POOL_TIMEOUT_SECONDS):
+        self.db_path = db_path or DATABASE_NAME
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue() # Most recently used first, so its page cache is warm
+        self._opened = 0
+        self._all = set() # Open connections of this pool; a returned connection not in it was dropped by close_all()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                # Never hand out a connection with someone else's uncommitted work
+                conn.rollback()
+            with self._lock:
+                reusable = conn in self._all
+                if reusable:
+                    self._idle.put(conn)
+            if not reusable:
+                conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._all = set()
+            self._opened = 0
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                conn = connect(self.db_path, check_same_thread=False)
+                conn.row_factory = sqlite3.Row # Allows accessing columns by name
+                self._opened += 1
+                self._all.add(conn)
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No database connection free after {self.timeout:g}s (all {self.size} in use; leaked or nested connection?)"
+            ) from None
+
+# Follow-up statuses counted as "active" on the dashboard
+ACTIVE_FOLLOW_UP_STATUSES_SQL = "('pending', 'in_progress')"
+
+# Keep user_stats / user_disease_counts in step with analyses and follow_ups
+USER_STATS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_analysis_insert AFTER INSERT ON analyses
+    WHEN NEW.user_id IS NOT NULL
+    BEGIN
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+        UPDATE user_stats SET total_analyses = total_analyses + 1 WHERE user_id = NEW.user_id;
+        INSERT INTO user_disease_counts (user_id, disease, analysis_count)
+            SELECT NEW.user_id, NEW.disease_detected, 1
+            WHERE NEW.disease_detected IS NOT NULL AND NEW.disease_detected NOT IN ('Unknown', 'Healthy')
+            ON CONFLICT (user_id, disease) DO UPDATE SET analysis_count = analysis_count + 1;
+        UPDATE user_stats SET unique_diseases = unique_diseases + 1
+            WHERE user_id = NEW.user_id
+            AND (SELECT analysis_count FROM user_disease_counts WHERE user_id = NEW.user_id AND disease = NEW.disease_detected) = 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_analysis_delete AFTER DELETE ON analyses
+    WHEN OLD.user_id IS NOT NULL
+    BEGIN
+        -- Follow-ups still attached to the analysis stop counting as active
+        UPDATE user_stats SET
+            total_analyses = total_analyses - 1,
+            active_follow_ups = active_follow_ups - (SELECT COUNT(*) FROM follow_ups WHERE analysis_id = OLD.id AND status IN {ACTIVE_FOLLOW_UP_STATUSES_SQL})
+            WHERE user_id = OLD.user_id;
+        UPDATE user_disease_counts SET analysis_count = analysis_count - 1 WHERE user_id = OLD.user_id AND disease = OLD.disease_detected;
+        UPDATE user_stats SET unique_diseases = unique_diseases - 1
+            WHERE user_id = OLD.user_id
+            AND (SELECT analysis_count FROM user_disease_counts WHERE user_id = OLD.user_id AND disease = OLD.disease_detected) = 0;
+        DELETE FROM user_disease_counts WHERE user_id = OLD.user_id AND analysis_count <= 0;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_follow_up_insert AFTER INSERT ON follow_ups
+    WHEN NEW.status IN {ACTIVE_FOLLOW_UP_STATUSES_SQL}
+    BEGIN
+        UPDATE user_stats SET active_follow_ups = active_follow_ups + 1
+            WHERE user_id = (SELECT user_id FROM analyses WHERE id = NEW.analysis_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_follow_up_delete AFTER DELETE ON follow_ups
+    WHEN OLD.status IN {ACTIVE_FOLLOW_UP_STATUSES_SQL}
+    BEGIN
+        UPDATE user_stats SET active_follow_ups = active_follow_ups - 1
+            WHERE user_id = (SELECT user_id FROM analyses WHERE id = OLD.analysis_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_follow_up_status AFTER UPDATE OF status ON follow_ups
+    BEGIN
+        UPDATE user_stats SET active_follow_ups = active_follow_ups
+            + COALESCE(NEW.status IN {ACTIVE_FOLLOW_UP_STATUSES_SQL}, 0)
+            - COALESCE(OLD.status IN {ACTIVE_FOLLOW_UP_STATUSES_SQL}, 0)
+            WHERE user_id = (SELECT user_id FROM analyses WHERE id = NEW.analysis_id);
+    END
+    """,
+]
+
+def rebuild_user_stats(cursor: sqlite3.Cursor) -> None:
+    """
+    Recomputes user_stats and user_disease_counts from scratch (backfill and repair).
+    The caller commits.
+    """
+    cursor.execute("DELETE FROM user_disease_counts")
+    cursor.execute("DELETE FROM user_stats")
+    cursor.execute("""
+        INSERT INTO user_disease_counts (user_id, disease, analysis_count)
+        SELECT user_id, disease_detected, COUNT(*) FROM analyses
+        WHERE user_id IS NOT NULL AND disease_detected IS NOT NULL AND disease_detected NOT IN ('Unknown', 'Healthy')
+        GROUP BY user_id, disease_detected
+    """)
+    cursor.execute(f"""
+        INSERT INTO user_stats (user_id, total_analyses, unique_diseases, active_follow_ups)
+        SELECT a.user_id, COUNT(*),
+            (SELECT COUNT(*) FROM user_disease_counts d WHERE d.user_id = a.user_id),
+            (SELECT COUNT(*) FROM follow_ups f JOIN analyses fa ON f.analysis_id = fa.id
+             WHERE fa.user_id = a.user_id AND f.status IN {ACTIVE_FOLLOW_UP_STATUSES_SQL})
+        FROM analyses a WHERE a.user_id IS NOT NULL
+        GROUP BY a.user_id
+    """)
+
+# Period starts for the trend rollups: the calendar day, and the Monday of the ISO week
+ROLLUP_PERIODS = {
+    "day": "date({column})",
+    "week": "date({column}, 'weekday 0', '-6 days')",
+}
+
+def _rollup_trigger_statements(row: str, delta: int) -> str:
+    statements = []
+    for granularity, period in ROLLUP_PERIODS.items():
+        if delta > 0:
+            statements.append(f"""
+        INSERT INTO analysis_rollups (user_id, granularity, period_start, disease, confidence_band, analysis_count)
+            SELECT {row}.user_id, '{granularity}', {period.format(column=f'{row}.analysis_date')},
+                COALESCE({row}.disease_detected, 'Unknown'), {confidence_band_sql(f'{row}.confidence_score')}, 1
+            WHERE true
+            ON CONFLICT (user_id, granularity, period_start, disease, confidence_band) DO UPDATE SET analysis_count = analysis_count + 1;""")
+        else:
+            statements.append(f"""
+        UPDATE analysis_rollups SET analysis_count = analysis_count - 1
+            WHERE user_id = {row}.user_id AND granularity = '{granularity}'
+            AND period_start = {period.format(column=f'{row}.analysis_date')}
+            AND disease = COALESCE({row}.disease_detected, 'Unknown')
+            AND confidence_band = {confidence_band_sql(f'{row}.confidence_score')};""")
+    if delta < 0:
+        statements.append(f"""
+        DELETE FROM analysis_rollups WHERE user_id = {row}.user_id AND analysis_count <= 0;""")
+    return "".join(statements)
+
+# Daily and weekly analysis counts per user, disease and confidence band for the trend charts
+ANALYSIS_ROLLUP_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollups_analysis_insert AFTER INSERT ON analyses
+    WHEN NEW.user_id IS NOT NULL
+    BEGIN{_rollup_trigger_statements("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_rollups_analysis_delete AFTER DELETE ON analyses
+    WHEN OLD.user_id IS NOT NULL
+    BEGIN{_rollup_trigger_statements("OLD", -1)}
+    END
+    """,
+]
+
+def rebuild_analysis_rollups(cursor: sqlite3.Cursor) -> None:
+    """
+    Recomputes analysis_rollups from the analyses table. The caller commits.
+    """
+    cursor.execute("DELETE FROM analysis_rollups")
+    for granularity, period in ROLLUP_PERIODS.items():
+        cursor.execute(f"""
+            INSERT INTO analysis_rollups (user_id, granularity, period_start, disease, confidence_band, analysis_count)
+            SELECT user_id, '{granularity}', {period.format(column='analysis_date')}, COALESCE(disease_detected, 'Unknown'),
+                {confidence_band_sql('confidence_score')}, COUNT(*)
+            FROM analyses WHERE user_id IS NOT NULL
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+
+# Reference counts for stored images: how many analyses point at each image_path.
+# Rows that drop to 0 are kept (with released_at) so storage cleanup can apply a grace period.
+IMAGE_REF_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_image_refs_analysis_insert AFTER INSERT ON analyses
+    BEGIN
+        INSERT INTO image_refs (image_path, ref_count) VALUES (NEW.image_path, 1)
+            ON CONFLICT (image_path) DO UPDATE SET ref_count = ref_count + 1, released_at = NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_image_refs_analysis_delete AFTER DELETE ON analyses
+    BEGIN
+        UPDATE image_refs SET ref_count = ref_count - 1,
+            released_at = CASE WHEN ref_count = 1 THEN CURRENT_TIMESTAMP ELSE released_at END
+        WHERE image_path = OLD.image_path;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_image_refs_analysis_path AFTER UPDATE OF image_path ON analyses
+    WHEN NEW.image_path IS NOT OLD.image_path
+    BEGIN
+        UPDATE image_refs SET ref_count = ref_count - 1,
+            released_at = CASE WHEN ref_count = 1 THEN CURRENT_TIMESTAMP ELSE released_at END
+        WHERE image_path = OLD.image_path;
+        INSERT INTO image_refs (image_path, ref_count) VALUES (NEW.image_path, 1)
+            ON CONFLICT (image_path) DO UPDATE SET ref_count = ref_count + 1, released_at = NULL;
+    END
+    """,
+]
+
+def rebuild_image_refs(cursor: sqlite3.Cursor) -> None:
+    """
+    Recounts image_refs from analyses (backfill and repair). Paths nothing points at any more
+    keep a row with ref_count 0. The caller commits.
+    """
+    cursor.execute("UPDATE image_refs SET ref_count = 0, released_at = COALESCE(released_at, CURRENT_TIMESTAMP)")
+    cursor.execute("""
+        INSERT INTO image_refs (image_path, ref_count)
+        SELECT image_path, COUNT(*) FROM analyses WHERE true GROUP BY image_path -- WHERE keeps ON CONFLICT unambiguous
+        ON CONFLICT (image_path) DO UPDATE SET ref_count = excluded.ref_count, released_at = NULL
+    """)
+
+# Full-text search: FTS5 tables with external content, so the index keeps no second copy of the text.
+# unicode61 with remove_diacritics folds ş, ğ, ü, ö, ç and İ, but Turkish dotless ı is a letter of its own
+# to it; FTS_FOLD maps it in the indexed values (the content views below) and in queries, so 'bakir' finds 'bakır'.
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+FTS_FOLD = {"ı": "i", "İ": "I"} # One character for one: snippet offsets stay valid
+
+def fold_for_search(text: str) -> str:
+    for char, replacement in FTS_FOLD.items():
+        text = text.replace(char, replacement)
+    return text
+
+def _fold_sql(expression: str) -> str:
+    for char, replacement in FTS_FOLD.items():
+        expression = f"replace({expression}, '{char}', '{replacement}')"
+    return expression
+
+# name -> (source table, content view, {column: value expression}, rank function)
+FTS_INDEXES = {
+    # Analyses and recommendations carry an owner token ('u<user_id>') so a search is scoped
+    # to one user inside the index instead of filtering every match afterwards
+    "analyses_fts": ("analyses", "analyses_search_content", {
+        "disease_detected": _fold_sql("{row}.disease_detected"),
+        "detailed_description": _fold_sql("{row}.detailed_description"),
+        "possible_causes": _fold_sql("{row}.possible_causes"),
+        "immediate_actions": _fold_sql("{row}.immediate_actions"),
+        "owner": "'u' || {row}.user_id",
+    }, "bm25(4.0, 1.0, 1.0, 1.0, 0.0)"),
+    # delete_analysis removes recommendations before their analysis, so the owner lookup still finds it
+    "recommendations_fts": ("recommendations", "recommendations_search_content", {
+        "description": _fold_sql("{row}.description"),
+        "owner": "(SELECT 'u' || user_id FROM analyses WHERE id = {row}.analysis_id)",
+    }, "bm25(1.0, 0.0)"),
+    "questions_fts": ("questions", "questions_search_content", {
+        "title": _fold_sql("{row}.title"),
+        "question_text": _fold_sql("{row}.question_text"),
+    }, "bm25(3.0, 1.0)"),
+    "answers_fts": ("answers", "answers_search_content", {"answer_text": _fold_sql("{row}.answer_text")}, "bm25(1.0)"),
+}
+# Content views return exactly what the triggers index (snippet() re-tokenizes them)
+FTS_CONTENT_VIEWS = {
+    "analyses_search_content": f"""
+        SELECT id, {_fold_sql("disease_detected")} AS disease_detected, {_fold_sql("detailed_description")} AS detailed_description,
+        {_fold_sql("possible_causes")} AS possible_causes, {_fold_sql("immediate_actions")} AS immediate_actions, 'u' || user_id AS owner
+        FROM analyses
+    """,
+    "recommendations_search_content": f"""
+        SELECT r.id, {_fold_sql("r.description")} AS description, 'u' || a.user_id AS owner
+        FROM recommendations r JOIN analyses a ON a.id = r.analysis_id
+    """,
+    "questions_search_content": f"""
+        SELECT id, {_fold_sql("title")} AS title, {_fold_sql("question_text")} AS question_text FROM questions
+    """,
+    "answers_search_content": f"""
+        SELECT id, {_fold_sql("answer_text")} AS answer_text FROM answers
+    """,
+}
+
+def _replace_schema_object(cursor: sqlite3.Cursor, kind: str, name: str, sql: str) -> bool:
+    """
+    Creates a view, trigger or table from sql (no IF NOT EXISTS), dropping an existing one with a
+    different definition first. Returns True if it was (re)created.
+    """
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = ? AND name = ?", (kind, name))
+    existing = cursor.fetchone()
+    if existing is not None and existing[0] == sql:
+        return False
+    if existing is not None:
+        cursor.execute(f"DROP {kind.upper()} {name}")
+    cursor.execute(sql)
+    return True
+
+def _fts_triggers(name: str) -> dict:
+    source, _, columns, _ = FTS_INDEXES[name]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(expression.format(row="NEW") for expression in columns.values())
+    old_values = ", ".join(expression.format(row="OLD") for expression in columns.values())
+    insert = f"INSERT INTO {name} (rowid, {column_list}) VALUES (NEW.id, {new_values});"
+    delete = f"INSERT INTO {name} ({name}, rowid, {column_list}) VALUES ('delete', OLD.id, {old_values});"
+    # Only edits to the source columns of the index re-index the row; others (e.g. image_path) don't touch it
+    source_columns = dict.fromkeys(re.findall(r"\{row\}\.(\w+)", " ".join(columns.values())))
+    return {
+        f"trg_{name}_insert": f"CREATE TRIGGER trg_{name}_insert AFTER INSERT ON {source} BEGIN {insert} END",
+        f"trg_{name}_delete": f"CREATE TRIGGER trg_{name}_delete AFTER DELETE ON {source} BEGIN {delete} END",
+        f"trg_{name}_update": f"CREATE TRIGGER trg_{name}_update AFTER UPDATE OF {', '.join(source_columns)} ON {source} BEGIN {delete} {insert} END",
+    }
+
+def init_db(db_path: Optional[str] = None):
     """Initializes the SQLite database and creates tables if they don't exist."""
+    db_path = db_path or DATABASE_NAME
     conn = None
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = connect(db_path)
         cursor = conn.cursor()
 
         # Users table
@@ -59,6 +414,14 @@ def init_db():
         # if 'immediate_actions' not in analyses_columns:
         #     cursor.execute("ALTER TABLE analyses ADD COLUMN immediate_actions TEXT;")
         #     print("Database: Added 'immediate_actions' to analyses table.")
+        if 'image_phash' not in analyses_columns:
+            cursor.execute("ALTER TABLE analyses ADD COLUMN image_phash TEXT;")
+            print("Database: Added 'image_phash' to analyses table.")
+        # History and dashboard queries filter by user and sort newest first
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyses_user_date ON analyses (user_id, analysis_date DESC, id DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyses_user_disease ON analyses (user_id, disease_detected)")
+        # Covers the perceptual hash index load at start-up
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_analyses_phash ON analyses (id, image_phash) WHERE image_phash IS NOT NULL AND disease_detected IS NOT NULL AND disease_detected != 'Unknown'")
         print("Database: analyses table checked/created.")
 
         # Recommendations table
@@ -79,6 +442,7 @@ def init_db():
             cursor.execute("ALTER TABLE recommendations ADD COLUMN estimated_cost REAL;")
             print("Database: Added 'estimated_cost' to recommendations table.")
 
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_analysis ON recommendations (analysis_id, priority)")
         print("Database: recommendations table checked/created.")
 
         # Follow-ups table
@@ -92,6 +456,8 @@ def init_db():
                 FOREIGN KEY (analysis_id) REFERENCES analyses (id)
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_follow_ups_analysis_date ON follow_ups (analysis_id, follow_up_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_follow_ups_analysis_status ON follow_ups (analysis_id, status)")
         print("Database: follow_ups table checked/created.")
 
         # Questions table for community forum
@@ -105,6 +471,7 @@ def init_db():
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_questions_created_at ON questions (created_at)")
         print("Database: questions table checked/created.")
 
         # Answers table for community forum
@@ -119,10 +486,114 @@ def init_db():
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id, created_at)")
         print("Database: answers table checked/created.")
 
+        # Generic key/value cache (e.g. parsed Gemini analyses keyed by image hash)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (namespace, cache_key)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_last_accessed ON cache_entries (namespace, last_accessed)")
+        print("Database: cache_entries table checked/created.")
+
+        # Per-user dashboard counters, maintained by triggers so the Dashboard reads a single row
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'")
+        user_stats_exists = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_stats (
+                user_id INTEGER PRIMARY KEY,
+                total_analyses INTEGER NOT NULL DEFAULT 0,
+                unique_diseases INTEGER NOT NULL DEFAULT 0,
+                active_follow_ups INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_disease_counts (
+                user_id INTEGER NOT NULL,
+                disease TEXT NOT NULL,
+                analysis_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, disease)
+            )
+        """)
+        for trigger in USER_STATS_TRIGGERS:
+            cursor.execute(trigger)
+        if not user_stats_exists:
+            rebuild_user_stats(cursor)
+            print("Database: Backfilled user_stats from existing analyses.")
+        print("Database: user_stats tables checked/created.")
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analysis_rollups'")
+        rollups_exist = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_rollups (
+                user_id INTEGER NOT NULL,
+                granularity TEXT NOT NULL,
+                period_start TEXT NOT NULL,
+                disease TEXT NOT NULL,
+                confidence_band TEXT NOT NULL,
+                analysis_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, granularity, period_start, disease, confidence_band)
+            )
+        """)
+        for trigger in ANALYSIS_ROLLUP_TRIGGERS:
+            cursor.execute(trigger)
+        if not rollups_exist:
+            rebuild_analysis_rollups(cursor)
+            print("Database: Backfilled analysis_rollups from existing analyses.")
+        print("Database: analysis_rollups table checked/created.")
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'image_refs'")
+        image_refs_exist = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS image_refs (
+                image_path TEXT PRIMARY KEY,
+                ref_count INTEGER NOT NULL DEFAULT 0,
+                released_at TIMESTAMP
+            )
+        """)
+        # Storage cleanup walks the unreferenced images in path order
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_image_refs_released ON image_refs (image_path) WHERE ref_count = 0")
+        for trigger in IMAGE_REF_TRIGGERS:
+            cursor.execute(trigger)
+        if not image_refs_exist:
+            rebuild_image_refs(cursor)
+            print("Database: Backfilled image_refs from existing analyses.")
+        print("Database: image_refs table checked/created.")
+
+        try:
+            # Definitions are compared with the stored ones, so a changed view, index or trigger
+            # (e.g. the ı folding) is replaced and its index rebuilt on the next start
+            changed_views = {
+                view for view, select in FTS_CONTENT_VIEWS.items()
+                if _replace_schema_object(cursor, "view", view, f"CREATE VIEW {view} AS {select.strip()}")
+            }
+            for name, (_, content, columns, rank) in FTS_INDEXES.items():
+                created = _replace_schema_object(cursor, "table", name, (
+                    f"CREATE VIRTUAL TABLE {name} USING fts5({', '.join(columns)}, "
+                    f"content='{content}', content_rowid='id', tokenize='{FTS_TOKENIZE}', prefix='2 3')"
+                ))
+                for trigger, trigger_sql in _fts_triggers(name).items():
+                    _replace_schema_object(cursor, "trigger", trigger, trigger_sql)
+                if created:
+                    cursor.execute(f"INSERT INTO {name} ({name}, rank) VALUES ('rank', '{rank}')")
+                if created or content in changed_views:
+                    cursor.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+                    print(f"Database: Built full-text index {name}.")
+            print("Database: full-text search tables checked/created.")
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5: everything else works, search just returns no results
+            print(f"Database: Full-text search unavailable ({e}).")
+
         conn.commit()
-        print(f"Database '{DATABASE_NAME}' initialization process completed.")
+        print(f"Database '{db_path}' initialization process completed.")
     except sqlite3.Error as e:
         print(f"Database Error during initialization: {e}")
     finally:
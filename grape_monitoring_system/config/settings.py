@@ -6,10 +6,87 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Database Configuration (already defined in database.py, but can be referenced here if needed)
 # DATABASE_NAME = 'grape_monitoring_system/data/database.db'
 
+# SQLite connection tuning (applied to every connection by config.database.connect)
+SQLITE_BUSY_TIMEOUT_MS = 5000 # Wait this long for a lock instead of failing with "database is locked"
+SQLITE_SYNCHRONOUS = "NORMAL" # Safe with WAL; only the last transactions can be lost on power failure
+SQLITE_CACHE_SIZE_KIB = 16 * 1024 # Page cache per connection
+SQLITE_POOL_SIZE = 8 # Connections kept open by each DatabaseService
+SQLITE_POOL_TIMEOUT_SECONDS = 30 # Wait this long for a free pooled connection, then raise sqlite3.OperationalError
+# Optional write-behind mode: one writer thread group-commits queued writes (see services/write_behind.py)
+WRITE_BEHIND_ENABLED = False
+WRITE_BEHIND_MAX_QUEUE = 1000 # Pending writes before callers block
+WRITE_BEHIND_MAX_BATCH = 200 # Writes per group commit
+# analyses.gemini_response is stored zlib-compressed with a preset dictionary (see utils/compression.py)
+COMPRESS_GEMINI_RESPONSES = True
+TEXT_COMPRESSION_LEVEL = 9 # Responses are written once and read rarely
+TEXT_COMPRESSION_MIN_BYTES = 64 # Shorter texts are stored as plain TEXT
+
 # Application Settings
 APP_TITLE = "Üzüm Takip Destek Öneri Sistemi"
 APP_ICON = "🍇"
+# Uploaded images live in a content-addressed store: <UPLOAD_DIR>/ab/cd/<sha256>.<ext>
+UPLOAD_DIR = "grape_monitoring_system/data/uploads"
+IMAGE_STORE_SHARD_LEVELS = 2 # Two hex digits per level: 256 * 256 leaf directories
+# Thumbnails are written next to the store (<UPLOAD_DIR>/thumbs/ab/cd/<sha256>.webp, JPEG without WebP support)
+THUMBNAIL_SIZE = (256, 256)
+THUMBNAIL_QUALITY = 70
+THUMBNAIL_CACHE_MAX_ENTRIES = 512 # In-process LRU of thumbnail bytes, roughly 10 KB each
+UPLOAD_PREVIEW_SIZE = (640, 640) # Downscaled upload preview sent to the browser
+IMAGE_DECODE_CONCURRENCY = 4 # Uploads decoded at the same time per process; the rest wait instead of adding bitmaps
+# Optional process pool for image work (see services/image_pool.py): uses every core instead of one GIL
+IMAGE_PROCESS_POOL_ENABLED = False
+IMAGE_PROCESS_POOL_WORKERS = None # Defaults to os.cpu_count()
+IMAGE_PROCESS_POOL_MAX_PENDING = None # Jobs queued or running before callers block; defaults to 2 per worker
+# Storage cleanup (services/storage_gc.py): files nothing references are removed after a grace period
+STORAGE_GC_GRACE_SECONDS = 24 * 60 * 60 # Covers uploads whose analysis is still being saved
+STORAGE_GC_BATCH_SIZE = 1000 # Files per batch; the scan position is checkpointed after each batch
+STORAGE_GC_QUARANTINE = True # Move orphans to <UPLOAD_DIR>/quarantine instead of deleting them
+STORAGE_GC_QUARANTINE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+HISTORY_PAGE_SIZE = 20 # Analyses loaded per "load more" on the History page
+FORUM_PAGE_SIZE = 20 # Questions loaded per "load more" in the forum
+DASHBOARD_RECENT_ANALYSES = 5
 
 # --- External API Keys ---
 OPENWEATHER_API_KEY = "your_openweather_api_key_here" # Get your key from https://openweathermap.org/api"
+WEATHER_REQUEST_TIMEOUT_SECONDS = 5
+# Start the weather lookup when an image is submitted instead of after the vision analysis
+WEATHER_PREFETCH = True
+# Print per-stage timings (critical path vs. parallel stages) of every image analysis to the server log
+STAGE_TIMING_ENABLED = False
+# Weather readings are reused within a time bucket and served stale (while refreshing) up to the max age
+WEATHER_CACHE_BUCKET_SECONDS = 30 * 60
+WEATHER_CACHE_MAX_STALE_SECONDS = 6 * 60 * 60
+WEATHER_CACHE_MAX_ENTRIES = 256 # In-process LRU size
+WEATHER_CACHE_SHARED = True # Also keep readings in SQLite so every Streamlit worker shares them
+
+# --- Circuit breakers for external services (Gemini, OpenWeatherMap, DuckDuckGo) ---
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5 # Consecutive failures before failing fast
+CIRCUIT_BREAKER_RECOVERY_SECONDS = 30 # How long to fail fast before letting a probe call through
+
+# --- Caching ---
+# Parsed Gemini analyses are cached by a hash of the processed image bytes and the prompt version.
+ANALYSIS_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60 # 30 days
+ANALYSIS_CACHE_MAX_ENTRIES = 5000
+# A cache hit only rewrites last_accessed (the LRU order) once it is this old, so most hits stay read-only:
+# a fraction of the namespace TTL, capped by the interval (which also applies to namespaces without a TTL)
+CACHE_TOUCH_TTL_FRACTION = 0.1
+CACHE_TOUCH_MAX_INTERVAL_SECONDS = 60 * 60
+
+# Uploads whose perceptual hash is within this Hamming distance of an earlier analysis reuse its result
+PHASH_MAX_DISTANCE = 4
+
+# Generated recommendations are reused per (disease, confidence band, weather bucket)
+RECOMMENDATION_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+RECOMMENDATION_CACHE_UNKNOWN_WEATHER_TTL_SECONDS = 60 * 60 # Shorter when the prompt had no weather
+RECOMMENDATION_CACHE_MAX_ENTRIES = 2000
 
+# --- Gemini request limits ---
+GEMINI_MAX_IN_FLIGHT = 32 # Concurrent requests per AsyncGeminiClient
+GEMINI_REQUEST_TIMEOUT_SECONDS = 60
+# Client-side rate limit shared by all Gemini callers in the process; match it to the project's quota
+GEMINI_REQUESTS_PER_MINUTE = 60
+GEMINI_BURST = 5
+# Retries on 429/5xx with full-jitter exponential backoff
+GEMINI_MAX_RETRIES = 4
+GEMINI_RETRY_BASE_DELAY_SECONDS = 1.0
+GEMINI_RETRY_MAX_DELAY_SECONDS = 30.0
@@ -1,17 +1,71 @@
-from core.gemini_client import GeminiClient
+from core.gemini_client import GeminiClient, AsyncGeminiClient
+from services.cache_service import CacheService
+from config.settings import ANALYSIS_CACHE_TTL_SECONDS, ANALYSIS_CACHE_MAX_ENTRIES
+import asyncio
 import json
+import hashlib
 from typing import Optional
 import re # Added for regex extraction
 
 class DiseaseAnalyzer:
-    def __init__(self):
+    # Bump whenever the prompt below changes so cached results from the old prompt are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, async_gemini_client: Optional[AsyncGeminiClient] = None):
         self.gemini_client = GeminiClient()
+        self._async_gemini_client = async_gemini_client
+        self.cache = CacheService("disease_analysis", ttl_seconds=ANALYSIS_CACHE_TTL_SECONDS, max_entries=ANALYSIS_CACHE_MAX_ENTRIES)
+
+    @property
+    def async_gemini_client(self) -> AsyncGeminiClient:
+        # Created lazily so that it binds to the event loop of the first awaiting caller
+        if self._async_gemini_client is None:
+            self._async_gemini_client = AsyncGeminiClient()
+        return self._async_gemini_client
+
+    def make_cache_key(self, image_data: bytes, mime_type: str) -> str:
+        """
+        Content address of an analysis request: SHA-256 of the image bytes, mime type and prompt version.
+        """
+        digest = hashlib.sha256()
+        digest.update(self.PROMPT_VERSION.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update((mime_type or "").encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(image_data)
+        return digest.hexdigest()
 
     def analyze_grape_image(self, image_data: bytes, mime_type: str) -> tuple[Optional[dict], Optional[str]]:
         """
         Analyzes a grape image for diseases using the Gemini API.
         Returns a dictionary with disease detection results and confidence score.
+        Identical images are served from the analysis cache without an API call.
+        """
+        cache_key = self.make_cache_key(image_data, mime_type)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print(f"Debugging: Analysis cache hit for {cache_key[:12]}")
+            return cached["analysis_result"], cached["gemini_response"]
+
+        gemini_response = self.gemini_client.analyze_image(image_data, self._build_prompt(), mime_type)
+        return self._finish_analysis(cache_key, gemini_response)
+
+    async def analyze_grape_image_async(self, image_data: bytes, mime_type: str, timeout: Optional[float] = None) -> tuple[Optional[dict], Optional[str]]:
         """
+        Awaitable version of analyze_grape_image built on AsyncGeminiClient.
+        Cancelling the awaiting task cancels the in-flight Gemini request.
+        The SQLite cache is read and written on a worker thread so it doesn't block the event loop.
+        """
+        cache_key = self.make_cache_key(image_data, mime_type)
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            print(f"Debugging: Analysis cache hit for {cache_key[:12]}")
+            return cached["analysis_result"], cached["gemini_response"]
+
+        gemini_response = await self.async_gemini_client.analyze_image(image_data, self._build_prompt(), mime_type, timeout=timeout)
+        return await asyncio.to_thread(self._finish_analysis, cache_key, gemini_response)
+
+    def _build_prompt(self) -> str:
         json_example = {
             "disease_detected": "Powdery Mildew",
             "confidence_score": 0.95,
@@ -22,7 +76,7 @@ class DiseaseAnalyzer:
         }
         json_example_str = json.dumps(json_example)
 
-        prompt = (
+        return (
             f"You are an expert viticulturist AI. Analyze the provided image of grape leaves/plant for any signs of diseases or health issues. "
             f"Identify the disease, provide a confidence score (0.0 to 1.0), a brief explanation, "
             f"a detailed description of the disease, its possible causes, and immediate actions/solutions. "
@@ -35,9 +89,14 @@ class DiseaseAnalyzer:
             f"YANITINIZ SADECE JSON NESNESİ OLMALIDIR. BAŞKA HİÇBİR METİN VEYA MARKDOWN KOD BLOĞU İŞARETİ KULLANMAYIN. Örnek: {json_example_str}"
         )
 
-        gemini_response = self.gemini_client.analyze_image(image_data, prompt, mime_type)
+    def _finish_analysis(self, cache_key: str, gemini_response: Optional[str]) -> tuple[Optional[dict], Optional[str]]:
+        """
+        Parses the raw Gemini response and caches successfully parsed results.
+        """
         analysis_result = {"disease_detected": "Unknown", "confidence_score": 0.0, "explanation": "Failed to get response from AI."} # Default in case of no response
 
+        parsed = False
+
         if gemini_response:
             print(f"Debugging: Raw Gemini Response: {gemini_response}")
             cleaned_response = gemini_response.strip()
@@ -50,6 +109,7 @@ class DiseaseAnalyzer:
 
             try:
                 analysis_result = json.loads(cleaned_response)
+                parsed = True
                 print(f"Debugging: Successfully parsed JSON directly: {cleaned_response}")
             except json.JSONDecodeError as e:
                 print(f"Error parsing response directly as JSON: {e}. Trying regex extraction...")
@@ -59,6 +119,7 @@ class DiseaseAnalyzer:
                     try:
                         extracted_json_str = json_match.group(0).strip()
                         analysis_result = json.loads(extracted_json_str)
+                        parsed = True
                         print(f"Debugging: Successfully parsed JSON with regex: {extracted_json_str}")
                     except json.JSONDecodeError as e_regex:
                         print(f"Error parsing regex extracted JSON: {e_regex}. Sticking with default error result.")
@@ -69,5 +130,8 @@ class DiseaseAnalyzer:
         else:
             print("Debugging: Gemini API returned None response.")
 
-        return analysis_result, gemini_response # Always return raw response
+        # Only successfully parsed results are cached; failures should be retried on the next upload
+        if parsed and isinstance(analysis_result, dict):
+            self.cache.set(cache_key, {"analysis_result": analysis_result, "gemini_response": gemini_response})
 
+        return analysis_result, gemini_response # Always return raw response
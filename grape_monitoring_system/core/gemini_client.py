@@ -1,6 +1,10 @@
 import google.generativeai
 import os
-from config.settings import GEMINI_API_KEY
+import asyncio
+from typing import Optional
+from config.settings import GEMINI_API_KEY, GEMINI_MAX_IN_FLIGHT, GEMINI_REQUEST_TIMEOUT_SECONDS
+from core.rate_limiter import get_gemini_rate_limiter
+from utils.circuit_breaker import get_circuit_breaker
 
 google.generativeai.configure(api_key=GEMINI_API_KEY)
 
@@ -10,6 +14,8 @@ class GeminiClient:
             raise ValueError("GEMINI_API_KEY is not set in environment variables.")
         self.vision_model = google.generativeai.GenerativeModel('gemini-1.5-flash') # Updated model for image analysis
         self.text_model = google.generativeai.GenerativeModel('gemini-1.5-flash') # Updated model for text-only generation (consistency)
+        self.rate_limiter = get_gemini_rate_limiter()
+        self.circuit_breaker = get_circuit_breaker("gemini")
 
     def analyze_image(self, image_data: bytes, prompt: str, mime_type: str):
         try:
@@ -18,7 +24,7 @@ class GeminiClient:
                 'mime_type': mime_type, # Use the provided mime_type
                 'data': image_data
             }
-            response = self.vision_model.generate_content([prompt, image_part])
+            response = self.circuit_breaker.call(self.rate_limiter.call, self.vision_model.generate_content, [prompt, image_part])
             # You might need to parse response.text or response.parts based on the expected output format
             return response.text
         except Exception as e:
@@ -27,9 +33,72 @@ class GeminiClient:
 
     def generate_text_stream(self, prompt: str):
         try:
-            response = self.text_model.generate_content(prompt, stream=True)
+            # Only opening the stream is rate limited and retried; errors while iterating reach the caller
+            response = self.circuit_breaker.call(self.rate_limiter.call, self.text_model.generate_content, prompt, stream=True)
             return response
         except Exception as e:
             print(f"Error generating text with Gemini API in GeminiClient: {e}")
             return None
 
+class AsyncGeminiClient:
+    """
+    asyncio counterpart of GeminiClient.
+    One instance reuses the same models (and their underlying async transport) for every call,
+    so many requests can be in flight on a single event loop without a thread each.
+    Create and use it inside the event loop that will await it.
+    """
+    def __init__(self, max_in_flight: int = GEMINI_MAX_IN_FLIGHT, timeout: float = GEMINI_REQUEST_TIMEOUT_SECONDS):
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is not set in environment variables.")
+        self.vision_model = google.generativeai.GenerativeModel('gemini-1.5-flash')
+        self.text_model = google.generativeai.GenerativeModel('gemini-1.5-flash')
+        self.timeout = timeout
+        self.rate_limiter = get_gemini_rate_limiter()
+        self.circuit_breaker = get_circuit_breaker("gemini")
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def analyze_image(self, image_data: bytes, prompt: str, mime_type: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Returns the response text, or None on error or timeout. Cancellation propagates to the caller.
+        """
+        image_part = {
+            'mime_type': mime_type,
+            'data': image_data
+        }
+        try:
+            async with self._semaphore:
+                response = await self.circuit_breaker.call_async(lambda: self.rate_limiter.call_async(lambda: asyncio.wait_for(
+                    self.vision_model.generate_content_async([prompt, image_part]),
+                    timeout if timeout is not None else self.timeout
+                )))
+            return response.text
+        except asyncio.TimeoutError:
+            print("Error analyzing image with Gemini API in AsyncGeminiClient: request timed out")
+            return None
+        except Exception as e:
+            print(f"Error analyzing image with Gemini API in AsyncGeminiClient: {e}")
+            return None
+
+    async def generate_text(self, prompt: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Streams a text response and returns it concatenated, or None on error or timeout.
+        The timeout covers the whole stream, not just the first chunk.
+        """
+        async def collect_stream() -> str:
+            response = await self.text_model.generate_content_async(prompt, stream=True)
+            text = ""
+            async for chunk in response:
+                text += chunk.text
+            return text
+
+        try:
+            async with self._semaphore:
+                return await self.circuit_breaker.call_async(lambda: self.rate_limiter.call_async(
+                    lambda: asyncio.wait_for(collect_stream(), timeout if timeout is not None else self.timeout)
+                ))
+        except asyncio.TimeoutError:
+            print("Error generating text with Gemini API in AsyncGeminiClient: request timed out")
+            return None
+        except Exception as e:
+            print(f"Error generating text with Gemini API in AsyncGeminiClient: {e}")
+            return None
@@ -0,0 +1,78 @@
+import threading
+from typing import Optional, Iterable
+from utils.image_utils import hamming_distance
+
+class PerceptualHashIndex:
+    """
+    In-memory multi-index hash table over 64-bit perceptual hashes of past analyses.
+
+    The hash is split into max_distance + 1 disjoint bit chunks. By the pigeonhole
+    principle, any hash within max_distance bits of the query matches it exactly on
+    at least one chunk, so a lookup is one dict probe per chunk plus a Hamming check
+    of the (few) candidates sharing that chunk, instead of a scan over every hash.
+    """
+    def __init__(self, max_distance: int = 4, hash_bits: int = 64):
+        self.max_distance = max_distance
+        self.hash_bits = hash_bits
+        num_chunks = max_distance + 1
+        base_width, extra = divmod(hash_bits, num_chunks)
+        self._chunks = []
+        shift = 0
+        for i in range(num_chunks):
+            width = base_width + (1 if i < extra else 0)
+            self._chunks.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._chunks]
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, analysis_id: int, phash: int) -> None:
+        with self._lock:
+            if analysis_id in self._hashes:
+                self._remove_locked(analysis_id)
+            self._hashes[analysis_id] = phash
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                table.setdefault((phash >> shift) & mask, set()).add(analysis_id)
+
+    def add_many(self, entries: Iterable[tuple[int, int]]) -> None:
+        for analysis_id, phash in entries:
+            self.add(analysis_id, phash)
+
+    def remove(self, analysis_id: int) -> None:
+        with self._lock:
+            self._remove_locked(analysis_id)
+
+    def find_nearest(self, phash: int, max_distance: Optional[int] = None) -> Optional[tuple[int, int]]:
+        """
+        Returns (analysis_id, distance) of the closest indexed hash within max_distance, or None.
+        max_distance is capped at the distance the index was built for.
+        """
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        best = None
+        with self._lock:
+            seen = set()
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                for analysis_id in table.get((phash >> shift) & mask, ()):
+                    if analysis_id in seen:
+                        continue
+                    seen.add(analysis_id)
+                    distance = hamming_distance(phash, self._hashes[analysis_id])
+                    # Prefer the closest match, then the most recent analysis
+                    if distance <= limit and (best is None or (distance, -analysis_id) < (best[1], -best[0])):
+                        best = (analysis_id, distance)
+        return best
+
+    def _remove_locked(self, analysis_id: int) -> None:
+        phash = self._hashes.pop(analysis_id, None)
+        if phash is None:
+            return
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            key = (phash >> shift) & mask
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(analysis_id)
+                if not bucket:
+                    del table[key]
@@ -0,0 +1,193 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Optional, Any, Awaitable
+from config.settings import (
+    GEMINI_REQUESTS_PER_MINUTE, GEMINI_BURST, GEMINI_MAX_IN_FLIGHT,
+    GEMINI_MAX_RETRIES, GEMINI_RETRY_BASE_DELAY_SECONDS, GEMINI_RETRY_MAX_DELAY_SECONDS
+)
+from utils.circuit_breaker import get_status_code
+
+# HTTP status codes worth retrying: quota exhaustion and transient server errors
+THROTTLE_STATUS_CODES = {429}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at rate_per_second up to capacity tokens.
+    """
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token if one is available and returns 0, otherwise returns the seconds until one will be.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate_per_second
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit: grows by roughly one slot per limit's worth of successful calls
+    and halves whenever the upstream throttles us, so in-flight calls track the available quota.
+    """
+    def __init__(self, initial_limit: float, min_limit: float = 1, max_limit: float = GEMINI_MAX_IN_FLIGHT):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = initial_limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_enter(self) -> bool:
+        with self._lock:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.limit = max(self.min_limit, self.limit / 2)
+
+class GeminiRateLimiter:
+    """
+    Client-side limiter shared by every Gemini caller in the process.
+    Each call waits for a concurrency slot and a rate token, and is retried with
+    full-jitter exponential backoff when Gemini answers 429 or 5xx.
+    """
+    # Granularity of the wait loops; slots and tokens free up asynchronously
+    POLL_INTERVAL_SECONDS = 0.01
+
+    def __init__(self, requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE, burst: float = GEMINI_BURST,
+                 max_in_flight: int = GEMINI_MAX_IN_FLIGHT, max_retries: int = GEMINI_MAX_RETRIES,
+                 base_delay: float = GEMINI_RETRY_BASE_DELAY_SECONDS, max_delay: float = GEMINI_RETRY_MAX_DELAY_SECONDS):
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.concurrency = AdaptiveConcurrencyLimiter(initial_limit=min(4, max_in_flight), max_limit=max_in_flight)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._metrics_lock = threading.Lock()
+        self._metrics = {"calls": 0, "queued": 0, "throttled": 0, "retried": 0, "failed": 0}
+
+    def metrics(self) -> dict:
+        """
+        Counters since start-up. 'queued' is the number of calls currently waiting for a slot or token.
+        """
+        with self._metrics_lock:
+            snapshot = dict(self._metrics)
+        snapshot["in_flight"] = self.concurrency.in_flight
+        snapshot["concurrency_limit"] = int(self.concurrency.limit)
+        return snapshot
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs fn(*args, **kwargs) under the limiter; re-raises the last error once retries are exhausted.
+        """
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self._count("queued")
+            try:
+                while not self.concurrency.try_enter():
+                    time.sleep(self.POLL_INTERVAL_SECONDS)
+            finally:
+                self._count("queued", -1)
+            try:
+                self._wait_for_token_blocking()
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._handle_failure(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.leave()
+            time.sleep(delay)
+
+    async def call_async(self, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaitable variant of call; coro_factory is invoked once per attempt.
+        """
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self._count("queued")
+            try:
+                while not self.concurrency.try_enter():
+                    await asyncio.sleep(self.POLL_INTERVAL_SECONDS)
+            finally:
+                self._count("queued", -1)
+            try:
+                wait = self.bucket.try_acquire()
+                while wait > 0:
+                    await asyncio.sleep(wait)
+                    wait = self.bucket.try_acquire()
+                result = await coro_factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = self._handle_failure(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.leave()
+            await asyncio.sleep(delay)
+
+    def _wait_for_token_blocking(self) -> None:
+        wait = self.bucket.try_acquire()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.bucket.try_acquire()
+
+    def _handle_failure(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Updates metrics and the concurrency limit; returns the backoff delay, or None if the error is final.
+        """
+        status_code = get_status_code(error)
+        if status_code in THROTTLE_STATUS_CODES:
+            self._count("throttled")
+            self.concurrency.on_throttle()
+        if status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+            self._count("failed")
+            return None
+        self._count("retried")
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+def get_gemini_rate_limiter() -> GeminiRateLimiter:
+    """
+    Returns the process-wide limiter used by GeminiClient and AsyncGeminiClient.
+    """
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = GeminiRateLimiter()
+        return _shared_limiter
@@ -1,12 +1,19 @@
-from core.gemini_client import GeminiClient
+from core.gemini_client import GeminiClient, AsyncGeminiClient
 from models.analysis import Analysis
 from models.recommendation import Recommendation
-from datetime import date
+from datetime import date, timedelta
 import json
+import asyncio
+import time
 import re # Import regex module
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional, List
 from services.weather_service import WeatherService # Import WeatherService
 from config.settings import OPENWEATHER_API_KEY # Import OPENWEATHER_API_KEY
+from config.settings import RECOMMENDATION_CACHE_TTL_SECONDS, RECOMMENDATION_CACHE_UNKNOWN_WEATHER_TTL_SECONDS, RECOMMENDATION_CACHE_MAX_ENTRIES
+from services.cache_service import CacheService
+from utils.buckets import normalize_disease, confidence_band, weather_bucket
+from utils.timing import StageTimer
 
 class RecommendationEngine:
     # Define a dictionary for chemical drug recommendations based on disease
@@ -38,24 +45,148 @@ class RecommendationEngine:
         ]
     }
 
-    def __init__(self):
+    def __init__(self, async_gemini_client: Optional[AsyncGeminiClient] = None):
         self.gemini_client = GeminiClient()
+        self._async_gemini_client = async_gemini_client
         self.weather_service = WeatherService(OPENWEATHER_API_KEY) # Initialize WeatherService
+        self._weather_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="weather-prefetch")
+        self.cache = CacheService("recommendations", ttl_seconds=RECOMMENDATION_CACHE_TTL_SECONDS, max_entries=RECOMMENDATION_CACHE_MAX_ENTRIES)
 
-    def generate_recommendations(self, analysis: Analysis) -> List[Recommendation]:
+    @property
+    def async_gemini_client(self) -> AsyncGeminiClient:
+        # Created lazily so that it binds to the event loop of the first awaiting caller
+        if self._async_gemini_client is None:
+            self._async_gemini_client = AsyncGeminiClient()
+        return self._async_gemini_client
+
+    def prefetch_weather(self, timer: Optional[StageTimer] = None) -> Future:
+        """
+        Starts the weather lookup in the background, e.g. as soon as an image is submitted,
+        so it overlaps with the vision analysis. Pass the future to generate_recommendations.
+        """
+        def fetch() -> dict:
+            start = time.perf_counter()
+            try:
+                return self._fetch_weather()
+            finally:
+                if timer:
+                    timer.record("weather fetch", start, time.perf_counter())
+
+        return self._weather_executor.submit(fetch)
+
+    def generate_recommendations(self, analysis: Analysis, weather_future: Optional[Future] = None, timer: Optional[StageTimer] = None) -> tuple[List[Recommendation], Optional[str]]:
         """
         Generates recommendations based on the analysis results.
         Prioritizes structured JSON from Gemini, falls back to text parsing if needed.
+        Uses the prefetched weather if weather_future is given, otherwise fetches it now.
+        Results are memoized per (disease, confidence band, weather bucket).
         """
         if analysis.disease_detected == "Healthy":
-            return [Recommendation(
-                analysis_id=analysis.id,
-                recommendation_type="prevention",
-                description="Üzüm bitkiniz sağlıklı. Sağlığını korumak için düzenli gözlem ve iyi kültürel uygulamalara devam edin.",
-                priority=1,
-                implementation_date=date.today()
-            )]
+            return self._healthy_recommendations(analysis), None
+
+        timer = timer or StageTimer()
+        if weather_future is not None:
+            with timer.stage("weather wait"):
+                weather_data = weather_future.result()
+        else:
+            with timer.stage("weather fetch"):
+                weather_data = self._fetch_weather()
+
+        cache_key = self.make_cache_key(analysis, weather_data)
+        cached = self._get_cached_recommendations(cache_key, analysis)
+        if cached is not None:
+            return cached
+
+        with timer.stage("text generation"):
+            prompt = self._build_prompt(analysis, self.weather_service.parse_weather_data(weather_data))
+            gemini_response_stream = self.gemini_client.generate_text_stream(prompt)
+            gemini_response = ""
+            if gemini_response_stream:
+                for chunk in gemini_response_stream:
+                    gemini_response += chunk.text
+
+        return self._finish_recommendations(cache_key, analysis, weather_data, gemini_response), gemini_response # Return raw response here
+
+    async def generate_recommendations_async(self, analysis: Analysis, timeout: Optional[float] = None) -> tuple[List[Recommendation], Optional[str]]:
+        """
+        Awaitable version of generate_recommendations built on AsyncGeminiClient.
+        The blocking weather lookup and SQLite cache run in worker threads so the event loop stays free.
+        """
+        if analysis.disease_detected == "Healthy":
+            return self._healthy_recommendations(analysis), None
+
+        weather_data = await asyncio.to_thread(self._fetch_weather)
+        cache_key = self.make_cache_key(analysis, weather_data)
+        cached = await asyncio.to_thread(self._get_cached_recommendations, cache_key, analysis)
+        if cached is not None:
+            return cached
 
+        prompt = self._build_prompt(analysis, self.weather_service.parse_weather_data(weather_data))
+        gemini_response = await self.async_gemini_client.generate_text(prompt, timeout=timeout) or ""
+        recommendations = await asyncio.to_thread(self._finish_recommendations, cache_key, analysis, weather_data, gemini_response)
+        return recommendations, gemini_response
+
+    def make_cache_key(self, analysis: Analysis, weather_data: dict) -> str:
+        return f"{normalize_disease(analysis.disease_detected)}|{confidence_band(analysis.confidence_score)}|{weather_bucket(weather_data)}"
+
+    def invalidate_recommendations(self, disease: Optional[str] = None) -> None:
+        """
+        Drops memoized recommendations for one disease, or all of them if disease is None.
+        """
+        if disease is None:
+            self.cache.clear()
+        else:
+            self.cache.delete_prefix(f"{normalize_disease(disease)}|")
+
+    def _get_cached_recommendations(self, cache_key: str, analysis: Analysis) -> Optional[tuple[List[Recommendation], Optional[str]]]:
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return None
+        print(f"Debugging (RecommendationEngine): Recommendation cache hit for {cache_key}")
+        today = date.today()
+        # Re-date to today, keeping each recommendation's original distance from the day it was generated
+        recommendations = [Recommendation(
+            analysis_id=analysis.id,
+            recommendation_type=rec['type'],
+            description=rec['description'],
+            priority=rec['priority'],
+            estimated_cost=rec.get('estimated_cost'),
+            implementation_date=today + timedelta(days=rec['day_offset'])
+        ) for rec in cached['recommendations']]
+        return recommendations + self._chemical_drug_recommendations(analysis), cached['gemini_response']
+
+    def _finish_recommendations(self, cache_key: str, analysis: Analysis, weather_data: dict, gemini_response: str) -> List[Recommendation]:
+        recommendations = self._parse_recommendations(analysis, gemini_response)
+        # Failed or malformed generations are not memoized, nor are results for failed analyses
+        if recommendations and analysis.disease_detected != "Unknown" and all(rec.recommendation_type != "hata" for rec in recommendations):
+            today = date.today()
+            ttl = RECOMMENDATION_CACHE_UNKNOWN_WEATHER_TTL_SECONDS if not weather_data else None
+            self.cache.set(cache_key, {
+                "recommendations": [{
+                    "type": rec.recommendation_type,
+                    "description": rec.description,
+                    "priority": rec.priority,
+                    "estimated_cost": rec.estimated_cost,
+                    "day_offset": (rec.implementation_date - today).days if rec.implementation_date else 0
+                } for rec in recommendations],
+                "gemini_response": gemini_response
+            }, ttl_seconds=ttl)
+        return recommendations + self._chemical_drug_recommendations(analysis)
+
+    def _healthy_recommendations(self, analysis: Analysis) -> List[Recommendation]:
+        return [Recommendation(
+            analysis_id=analysis.id,
+            recommendation_type="prevention",
+            description="Üzüm bitkiniz sağlıklı. Sağlığını korumak için düzenli gözlem ve iyi kültürel uygulamalara devam edin.",
+            priority=1,
+            implementation_date=date.today()
+        )]
+
+    def _fetch_weather(self) -> dict:
+        city = "Izmir" # TODO: Make city dynamic (e.g., from user profile or image metadata)
+        return self.weather_service.get_current_weather(city)
+
+    def _build_prompt(self, analysis: Analysis, weather_info: str) -> str:
         # Define the desired JSON structure for recommendations
         recommendation_example = [
             {
@@ -79,12 +210,7 @@ class RecommendationEngine:
         ]
         recommendation_example_str = json.dumps(recommendation_example, indent=2, ensure_ascii=False)
 
-        # Fetch weather data
-        city = "Izmir" # TODO: Make city dynamic (e.g., from user profile or image metadata)
-        current_weather_data = self.weather_service.get_current_weather(city)
-        weather_info = self.weather_service.parse_weather_data(current_weather_data)
-
-        prompt = (
+        return (
             f"Analiz sonucu: Tespit Edilen Hastalık - {analysis.disease_detected} (Güven: {analysis.confidence_score * 100:.2f}%). " if analysis.confidence_score is not None else f"Analiz sonucu: Tespit Edilen Hastalık - {analysis.disease_detected} (Güven: Bilinmiyor). "
             f"Mevcut hava durumu: {weather_info}. " # Add weather info to the prompt
             f"Bir uzman bağcı olarak, {analysis.disease_detected} için 3-5 pratik ve uygulanabilir tedavi, budama veya önleme önerisi sunun. "
@@ -93,12 +219,10 @@ class RecommendationEngine:
             f"Örnek: {recommendation_example_str}"
         )
 
-        gemini_response_stream = self.gemini_client.generate_text_stream(prompt)
-        gemini_response = ""
-        if gemini_response_stream:
-            for chunk in gemini_response_stream:
-                gemini_response += chunk.text
-
+    def _parse_recommendations(self, analysis: Analysis, gemini_response: str) -> List[Recommendation]:
+        """
+        Turns the raw Gemini text into Recommendation objects.
+        """
         recommendations = []
         if gemini_response:
             try:
@@ -180,6 +304,10 @@ class RecommendationEngine:
                 implementation_date=date.today()
             ))
 
+        return recommendations
+
+    def _chemical_drug_recommendations(self, analysis: Analysis) -> List[Recommendation]:
+        recommendations = []
         # Add chemical drug recommendations if applicable
         if analysis.disease_detected in self.CHEMICAL_DRUG_RECOMMENDATIONS and analysis.disease_detected != "Healthy":
             for drug_rec in self.CHEMICAL_DRUG_RECOMMENDATIONS[analysis.disease_detected]:
@@ -191,7 +319,7 @@ class RecommendationEngine:
                     implementation_date=date.today()
                 ))
 
-        return recommendations, gemini_response # Return raw response here
+        return recommendations
 
     def _parse_plain_text_recommendations(self, text: str, analysis_id: Optional[int]) -> List[Recommendation]:
         """
@@ -2,6 +2,7 @@
 
 import requests
 from bs4 import BeautifulSoup
+from utils.circuit_breaker import get_circuit_breaker
 
 
 def duckduckgo_search(query, max_results=5):
@@ -12,7 +13,8 @@ def duckduckgo_search(query, max_results=5):
     }
 
     try:
-        response = requests.post(url, data=params, headers=headers, timeout=10)
+        # Fails fast with CircuitOpenError while DuckDuckGo keeps erroring
+        response = get_circuit_breaker("duckduckgo").call(_post, url, params, headers)
         soup = BeautifulSoup(response.text, "html.parser")
         results = []
 
@@ -26,4 +28,8 @@ def duckduckgo_search(query, max_results=5):
     except Exception as e:
         return [{"title": "Arama hatası", "url": str(e)}]
 
- 
\ No newline at end of file
+
+def _post(url, params, headers):
+    response = requests.post(url, data=params, headers=headers, timeout=10)
+    response.raise_for_status()
+    return response
@@ -14,4 +14,5 @@ class Analysis:
     detailed_description: Optional[str] = None
     possible_causes: Optional[str] = None
     immediate_actions: Optional[str] = None
+    image_phash: Optional[str] = None # 64-bit dHash as 16 hex digits, used for near-duplicate lookup
 
@@ -0,0 +1,173 @@
+"""
+Analyses every image in a directory and stores the results like the Streamlit "Image Analysis" page.
+
+    python scripts/batch_analyze.py PHOTO_DIR --user-id 1 --concurrency 8
+
+Images are preprocessed and sent to Gemini by a bounded pool of worker threads; the
+database writes happen on the main thread. With --process-pool the image work itself
+(decode, resize, encode, hashing) runs in one worker process per core. Finished files
+are appended to a progress file, so re-running the same command skips them and only
+retries the rest.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Make the project packages (services, core, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import init_db
+from config.settings import IMAGE_PROCESS_POOL_ENABLED
+from core.disease_analyzer import DiseaseAnalyzer
+from core.rate_limiter import get_gemini_rate_limiter
+from core.recommendation_engine import RecommendationEngine
+from models.analysis import Analysis
+from services.database_service import DatabaseService
+from services.image_service import ImageService
+from utils.validators import is_valid_image_file
+
+MIME_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
+
+def load_progress(progress_path: str) -> set[str]:
+    """
+    Returns the relative paths already recorded in the progress file.
+    """
+    done = set()
+    if os.path.exists(progress_path):
+        with open(progress_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    done.add(json.loads(line)["file"])
+                except (json.JSONDecodeError, KeyError):
+                    pass # Ignore a line truncated by an interrupted run
+    return done
+
+def find_images(directory: str) -> list[str]:
+    found = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if is_valid_image_file(name):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(found)
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def process_image(directory: str, relative_path: str, user_id: int, image_service: ImageService, disease_analyzer: DiseaseAnalyzer, recommendation_engine: RecommendationEngine) -> dict:
+    """
+    Runs on a worker thread: preprocessing, Gemini analysis and recommendation generation.
+    """
+    start = time.perf_counter()
+    weather_future = recommendation_engine.prefetch_weather()
+    mime_type = MIME_TYPES.get(os.path.splitext(relative_path)[1].lower(), "image/jpeg")
+    with open(os.path.join(directory, relative_path), "rb") as f: # Decoded from the file, never read whole
+        processed_image_data, processed_mime_type = image_service.preprocess(f, mime_type, max_size=(1024, 1024))
+    saved_image_path = image_service.save_image(processed_image_data, os.path.basename(relative_path))
+    analysis_result, raw_gemini_analysis_response = disease_analyzer.analyze_grape_image(processed_image_data, processed_mime_type)
+    if raw_gemini_analysis_response is None:
+        raise RuntimeError("Gemini API returned no response")
+    analysis = Analysis(
+        user_id=user_id,
+        image_path=saved_image_path,
+        disease_detected=str(analysis_result.get('disease_detected', "Unknown")),
+        confidence_score=float(analysis_result.get('confidence_score', 0.0)),
+        gemini_response=raw_gemini_analysis_response,
+        detailed_description=analysis_result.get('detailed_description', None),
+        possible_causes=analysis_result.get('possible_causes', None),
+        immediate_actions=analysis_result.get('immediate_actions', None),
+        image_phash=f"{image_service.perceptual_hash(processed_image_data):016x}"
+    )
+    recommendations, _ = recommendation_engine.generate_recommendations(analysis, weather_future=weather_future)
+    return {"analysis": analysis, "recommendations": recommendations, "latency": time.perf_counter() - start}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Directory of vineyard photos (searched recursively)")
+    parser.add_argument("--user-id", type=int, required=True, help="User the analyses are stored under")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of images in flight (default: 4)")
+    parser.add_argument("--process-pool", action="store_true", help="Preprocess images in worker processes (one per core)")
+    parser.add_argument("--progress-file", help="Progress file for resuming (default: DIRECTORY/.batch_progress.jsonl)")
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    directory = os.path.abspath(args.directory)
+    progress_path = args.progress_file or os.path.join(directory, ".batch_progress.jsonl")
+
+    init_db()
+    db_service = DatabaseService()
+    image_service = ImageService(process_pool=args.process_pool or IMAGE_PROCESS_POOL_ENABLED)
+    disease_analyzer = DiseaseAnalyzer()
+    recommendation_engine = RecommendationEngine()
+
+    done = load_progress(progress_path)
+    pending = [path for path in find_images(directory) if path not in done]
+    print(f"{len(done)} images already analysed, {len(pending)} to go (concurrency {args.concurrency}).")
+
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor, open(progress_path, "a", encoding="utf-8") as progress_file:
+        queue = iter(pending)
+        in_flight = {}
+
+        def submit_next() -> bool:
+            relative_path = next(queue, None)
+            if relative_path is None:
+                return False
+            future = executor.submit(process_image, directory, relative_path, args.user_id, image_service, disease_analyzer, recommendation_engine)
+            in_flight[future] = relative_path
+            return True
+
+        # Keep at most `concurrency` images in flight instead of queueing the whole directory
+        for _ in range(args.concurrency):
+            if not submit_next():
+                break
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                relative_path = in_flight.pop(future)
+                try:
+                    result = future.result()
+                    analysis = result["analysis"]
+                    saved_ids = db_service.save_analysis_with_recommendations(analysis, result["recommendations"])
+                    if saved_ids is None:
+                        raise RuntimeError("analysis could not be saved")
+                    analysis_id = saved_ids[0]
+                    progress_file.write(json.dumps({"file": relative_path, "analysis_id": analysis_id}) + "\n")
+                    progress_file.flush()
+                    latencies.append(result["latency"])
+                    print(f"[{len(latencies) + failures}/{len(pending)}] {relative_path}: {analysis.disease_detected} ({result['latency']:.1f}s)")
+                except Exception as e:
+                    failures += 1
+                    print(f"[{len(latencies) + failures}/{len(pending)}] {relative_path}: FAILED ({e})")
+                submit_next()
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print("\n--- Throughput report ---")
+    print(f"Analysed: {len(latencies)}  Failed: {failures}  Elapsed: {elapsed:.1f}s")
+    if latencies:
+        print(f"Throughput: {len(latencies) / elapsed * 60:.1f} images/minute")
+        print(f"Latency p50: {percentile(latencies, 50):.2f}s  p95: {percentile(latencies, 95):.2f}s  max: {latencies[-1]:.2f}s")
+    print(f"Gemini limiter: {get_gemini_rate_limiter().metrics()}")
+    if failures:
+        print("Re-run the same command to retry the failed images.")
+    db_service.close_connection()
+
+if __name__ == "__main__":
+    main()
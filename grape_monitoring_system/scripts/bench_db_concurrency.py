@@ -0,0 +1,124 @@
+"""
+Simulates N concurrent users doing a mix of history reads and analysis writes against a temporary database.
+
+    python scripts/bench_db_concurrency.py --users 16 --ops 200 --write-ratio 0.2
+
+Compares the old access pattern (one shared connection, rollback journal, SELECT 1 probe
+before each query) with DatabaseService on the WAL connection pool, with and without write-behind.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import init_db
+from models.analysis import Analysis
+from services.database_service import DatabaseService
+
+DISEASES = ["Healthy", "Powdery Mildew", "Downy Mildew", "Black Rot", "Botrytis"]
+
+class SharedConnectionService(DatabaseService):
+    """
+    The previous DatabaseService behaviour: one rollback-journal connection shared by every thread,
+    probed with SELECT 1 before each query. The lock stands in for the serialization that sharing it implied.
+    """
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _connection(self):
+        with self.lock:
+            self.conn.execute("SELECT 1").fetchone()
+            yield self.conn
+
+    def close_connection(self):
+        self.conn.close()
+
+def seed(db_path: str, users: int, rows_per_user: int) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO analyses (user_id, image_path, disease_detected, confidence_score) VALUES (?, ?, ?, ?)",
+        [(user_id, f"seed/{user_id}_{i}.jpg", random.choice(DISEASES), random.random())
+         for user_id in range(1, users + 1) for i in range(rows_per_user)]
+    )
+    conn.commit()
+    conn.close()
+
+def run(label: str, service, users: int, ops: int, write_ratio: float, wait: bool = True) -> None:
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def simulate_user(user_id: int) -> None:
+        nonlocal errors
+        rng = random.Random(user_id)
+        for i in range(ops):
+            start = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    analysis = Analysis(user_id=user_id, image_path=f"bench/{user_id}_{i}.jpg",
+                                        disease_detected=rng.choice(DISEASES), confidence_score=rng.random())
+                    if wait:
+                        service.add_analysis(analysis)
+                    else:
+                        service.add_analysis(analysis, wait=False)
+                else:
+                    service.get_analyses_by_user_id(user_id)
+            except sqlite3.Error:
+                with lock:
+                    errors += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        list(executor.map(simulate_user, range(1, users + 1)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    print(f"{label:<18} {len(latencies) / wall:8.0f} ops/s   p50 {p50:6.2f} ms   p95 {p95:6.2f} ms   errors {errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=16, help="Concurrent simulated users")
+    parser.add_argument("--ops", type=int, default=200, help="Operations per user")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fraction of operations that insert an analysis")
+    parser.add_argument("--seed-rows", type=int, default=200, help="Analyses per user before the run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        modes = [
+            ("shared connection", SharedConnectionService),
+            ("WAL pool", DatabaseService),
+            ("write-behind", lambda db_path: DatabaseService(db_path, write_behind=True)),
+            ("write-behind async", lambda db_path: DatabaseService(db_path, write_behind=True)),
+        ]
+        for label, make_service in modes:
+            db_path = os.path.join(tmp_dir, f"{label.replace(' ', '_')}.db")
+            init_db(db_path)
+            seed(db_path, args.users, args.seed_rows)
+            service = make_service(db_path)
+            # The async mode doesn't wait for commits; its reads still see the user's own writes
+            run(label, service, args.users, args.ops, args.write_ratio, wait=not label.endswith("async"))
+            service.close_connection()
+
+if __name__ == "__main__":
+    main()
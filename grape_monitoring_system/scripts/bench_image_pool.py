@@ -0,0 +1,90 @@
+"""
+Measures image throughput (images/sec) of the upload pipeline with image work on the calling
+threads versus the process pool at increasing worker counts.
+
+    python scripts/bench_image_pool.py                        # 48 synthetic 12 MP photos, 1..cpu_count workers
+    python scripts/bench_image_pool.py --images DIR --workers 1 2 4 8
+
+Per image: preprocess to 1024 px JPEG, thumbnail, perceptual hash, all through ImageService,
+submitted by --clients threads at once (like concurrent Streamlit sessions or a batch import).
+Pool start-up is excluded from the timings.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the project packages (services, utils, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.settings import THUMBNAIL_SIZE
+from services.image_pool import ImageProcessPool, dhash_in_worker
+from services.image_service import ImageService, THUMBNAIL_FORMAT
+
+def _make_sample_images(target_dir: str, count: int) -> list[str]:
+    from PIL import Image
+    paths = []
+    for index in range(min(count, 4)): # A few distinct photos, reused round robin
+        photo = Image.effect_noise((4032, 3024), 40 + 10 * index).convert('RGB')
+        path = os.path.join(target_dir, f"camera_photo_{index}.jpg")
+        photo.save(path, format='JPEG', quality=92)
+        paths.append(path)
+    return paths
+
+def _process(image_service: ImageService, image_data: bytes) -> None:
+    processed, mime_type = image_service.preprocess(image_data, "image/jpeg", max_size=(1024, 1024))
+    image_service.preprocess(processed, mime_type, max_size=THUMBNAIL_SIZE, target_format=THUMBNAIL_FORMAT)
+    image_service.perceptual_hash(processed)
+
+def _measure(image_service: ImageService, images: list[bytes], count: int, clients: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(lambda index: _process(image_service, images[index % len(images)]), range(count)))
+    return count / (time.perf_counter() - start)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of images (default: generated photos)")
+    parser.add_argument("--count", type=int, default=48, help="Images processed per configuration")
+    parser.add_argument("--clients", type=int, default=16, help="Threads submitting images at once")
+    parser.add_argument("--workers", type=int, nargs="+", help="Pool sizes to try (default: 1, 2, 4, ... up to cpu_count)")
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({min(2 ** power, cpu_count) for power in range(cpu_count.bit_length() + 1)})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.images:
+            image_paths = sorted(
+                os.path.join(args.images, name) for name in os.listdir(args.images)
+                if name.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))
+            )
+        else:
+            image_paths = _make_sample_images(tmp_dir, args.count)
+        images = []
+        for path in image_paths:
+            with open(path, "rb") as f:
+                images.append(f.read())
+
+        image_service = ImageService(os.path.join(tmp_dir, "store"), process_pool=False)
+        print(f"{args.count} images, {args.clients} client threads, {cpu_count} CPU(s)")
+        print(f"{'backend':<20} {'images/sec':>10} {'speed-up':>9}")
+        baseline = _measure(image_service, images, args.count, args.clients)
+        print(f"{'in-thread':<20} {baseline:>10.2f} {1.0:>8.2f}x")
+
+        for workers in worker_counts:
+            pool = ImageProcessPool(workers=workers)
+            for future in [pool.submit(dhash_in_worker, images[0]) for _ in range(workers)]:
+                future.result() # Start the workers before timing
+            image_service.process_pool = pool
+            rate = _measure(image_service, images, args.count, args.clients)
+            pool.close()
+            print(f"{f'pool, {workers} worker(s)':<20} {rate:>10.2f} {rate / baseline:>8.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Benchmarks ImageService.preprocess against the old resize_image + convert_to_jpeg path.
+
+Each (path, image) pair runs in a fresh subprocess so peak RSS is measured in isolation.
+
+    python scripts/bench_image_preprocess.py                  # synthetic camera photo + screenshot
+    python scripts/bench_image_preprocess.py --images DIR     # every image in DIR
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make the project packages (services, utils, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+MODES = ("two_step", "single_pass")
+
+def _make_sample_images(target_dir: str) -> list[str]:
+    from PIL import Image
+    photo = Image.effect_noise((4032, 3024), 40).convert('RGB')
+    photo_path = os.path.join(target_dir, "camera_photo.jpg")
+    photo.save(photo_path, format='JPEG', quality=92)
+    screenshot = Image.linear_gradient('L').resize((1920, 1080)).convert('RGBA')
+    screenshot_path = os.path.join(target_dir, "screenshot.png")
+    screenshot.save(screenshot_path, format='PNG')
+    return [photo_path, screenshot_path]
+
+def _peak_rss_kb() -> int:
+    # VmHWM is reset on exec, unlike ru_maxrss which Linux carries over from the parent process
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _run_worker(mode: str, image_path: str, repeat: int) -> None:
+    from services.image_service import ImageService
+    service = ImageService.__new__(ImageService) # Skip creating the uploads directory
+    with open(image_path, "rb") as f:
+        image_data = f.read()
+    baseline_rss_kb = _peak_rss_kb()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if mode == "two_step":
+            output = service.convert_to_jpeg(service.resize_image(image_data, max_size=(1024, 1024)))
+        else:
+            output, _ = service.preprocess(image_data, "image/jpeg", max_size=(1024, 1024))
+        timings.append(time.perf_counter() - start)
+    peak_rss_kb = _peak_rss_kb()
+    print(json.dumps({
+        "median_ms": statistics.median(timings) * 1000,
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "delta_rss_mb": (peak_rss_kb - baseline_rss_kb) / 1024,
+        "output_bytes": len(output)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of images to benchmark (default: generated samples)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per image and path")
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "IMAGE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _run_worker(args.worker[0], args.worker[1], args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.images:
+            image_paths = sorted(
+                os.path.join(args.images, name) for name in os.listdir(args.images)
+                if name.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))
+            )
+        else:
+            image_paths = _make_sample_images(tmp_dir)
+
+        print(f"{'image':<40} {'path':<12} {'median ms':>10} {'peak RSS MB':>12} {'+RSS MB':>8} {'out KB':>8}")
+        for image_path in image_paths:
+            for mode in MODES:
+                result = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--repeat", str(args.repeat), "--worker", mode, image_path],
+                    capture_output=True, text=True, check=True
+                )
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                print(f"{os.path.basename(image_path)[:40]:<40} {mode:<12} {stats['median_ms']:>10.1f} "
+                      f"{stats['peak_rss_mb']:>12.1f} {stats['delta_rss_mb']:>8.1f} {stats['output_bytes'] / 1024:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Drives GeminiRateLimiter against a local fake Gemini endpoint that enforces its own quota.
+
+    python scripts/bench_rate_limiter.py --calls 300 --threads 32 --quota-rpm 1200
+
+The fake answers 429 once its per-second quota is used up and 503 at a small random rate,
+like Gemini under load. The report compares unprotected calls with calls through the limiter.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from core.rate_limiter import GeminiRateLimiter, TokenBucket
+
+class FakeGeminiError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+class FakeGeminiEndpoint:
+    def __init__(self, quota_rpm: float, latency_seconds: float, error_rate: float):
+        self.quota = TokenBucket(quota_rpm / 60, max(1.0, quota_rpm / 60))
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+
+    def generate_content(self, prompt: str) -> str:
+        time.sleep(self.latency_seconds)
+        if self.quota.try_acquire() > 0:
+            raise FakeGeminiError(429, "Resource has been exhausted (e.g. check quota).")
+        if random.random() < self.error_rate:
+            raise FakeGeminiError(503, "The service is currently unavailable.")
+        return f"ok: {prompt}"
+
+def run(label: str, calls: int, threads: int, make_call) -> None:
+    successes = 0
+    lock = threading.Lock()
+
+    def one_call(i: int) -> None:
+        nonlocal successes
+        try:
+            make_call(f"request {i}")
+        except FakeGeminiError:
+            return
+        with lock:
+            successes += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(one_call, range(calls)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} succeeded {successes:>5}/{calls}  in {elapsed:6.1f}s  -> {successes / elapsed * 60:7.0f} successful calls/min")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--quota-rpm", type=float, default=1200, help="Quota enforced by the fake endpoint")
+    parser.add_argument("--client-rpm", type=float, default=1500, help="Client-side token bucket rate (deliberately above the quota)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake endpoint latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of fake 503 responses")
+    args = parser.parse_args()
+
+    endpoint = FakeGeminiEndpoint(args.quota_rpm, args.latency, args.error_rate)
+    run("unprotected", args.calls, args.threads, endpoint.generate_content)
+
+    time.sleep(1) # Let the fake quota refill
+    endpoint = FakeGeminiEndpoint(args.quota_rpm, args.latency, args.error_rate)
+    limiter = GeminiRateLimiter(requests_per_minute=args.client_rpm, burst=5, max_in_flight=args.threads,
+                                max_retries=6, base_delay=0.05, max_delay=1.0)
+    run("rate limited", args.calls, args.threads, lambda prompt: limiter.call(endpoint.generate_content, prompt))
+    print(f"limiter metrics: {limiter.metrics()}")
+
+if __name__ == "__main__":
+    main()
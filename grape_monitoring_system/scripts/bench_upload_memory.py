@@ -0,0 +1,122 @@
+"""
+Measures peak memory of concurrent uploads going through the analysis pipeline
+(preview, preprocess, store, perceptual hash) in one process, as in a Streamlit server.
+
+    python scripts/bench_upload_memory.py                      # 50 uploads of a synthetic 12 MP camera photo
+    python scripts/bench_upload_memory.py --uploads 20 --format png
+    python scripts/bench_upload_memory.py --image photo.jpg
+
+Every mode runs in a fresh subprocess. Each upload has its own in-memory buffer, like Streamlit's
+UploadedFile; those buffers are allocated before the baseline, so "+RSS" is what processing adds.
+
+    read_unbounded  upload.read() into bytes, every upload decoded at once (the old path)
+    file_unbounded  decoded from the upload file object, every upload at once
+    file_bounded    decoded from the upload file object, IMAGE_DECODE_CONCURRENCY at once (the app)
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Make the project packages (services, utils, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+MODES = ("read_unbounded", "file_unbounded", "file_bounded")
+
+def _make_sample_image(target_dir: str, image_format: str) -> str:
+    from PIL import Image
+    photo = Image.effect_noise((4032, 3024), 60).convert('RGB') # Noise compresses about as badly as foliage
+    path = os.path.join(target_dir, f"camera_photo.{image_format}")
+    photo.save(path, format=image_format.upper(), **({"quality": 95} if image_format == "jpeg" else {}))
+    return path
+
+def _rss_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def _run_worker(mode: str, image_path: str, uploads: int) -> None:
+    import config.settings
+    if mode != "file_bounded":
+        config.settings.IMAGE_DECODE_CONCURRENCY = uploads # Before utils.image_utils reads it
+    from config.settings import IMAGE_DECODE_CONCURRENCY, UPLOAD_PREVIEW_SIZE
+    from services.image_service import ImageService
+    from utils.image_utils import preprocess_image, compute_dhash
+
+    with open(image_path, "rb") as f:
+        image_data = f.read()
+    upload_buffers = [io.BytesIO(bytes(bytearray(image_data))) for _ in range(uploads)] # One buffer per user
+    del image_data
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        image_service = ImageService(store_dir)
+        start_barrier = threading.Barrier(uploads)
+        errors = []
+
+        def upload(upload_buffer: io.BytesIO) -> None:
+            try:
+                start_barrier.wait()
+                source = upload_buffer.read() if mode == "read_unbounded" else upload_buffer
+                preprocess_image(source, max_size=UPLOAD_PREVIEW_SIZE, target_format="JPEG")
+                processed, _ = image_service.preprocess(source, "image/jpeg", max_size=(1024, 1024))
+                image_service.save_image(processed, "upload.jpg")
+                compute_dhash(processed)
+            except Exception as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=upload, args=(upload_buffer,)) for upload_buffer in upload_buffers]
+        baseline_rss_kb = _rss_kb("VmRSS")
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    peak_rss_kb = _rss_kb("VmHWM")
+    print(json.dumps({
+        "decode_slots": IMAGE_DECODE_CONCURRENCY,
+        "baseline_rss_mb": baseline_rss_kb / 1024,
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "delta_rss_mb": (peak_rss_kb - baseline_rss_kb) / 1024,
+        "seconds": elapsed,
+        "errors": len(errors)
+    }))
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=50, help="Concurrent uploads")
+    parser.add_argument("--image", help="Image to upload (default: a generated 4032x3024 photo)")
+    parser.add_argument("--format", choices=("jpeg", "png"), default="jpeg", help="Format of the generated photo")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="Modes to run")
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "IMAGE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _run_worker(args.worker[0], args.worker[1], args.uploads)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_path = args.image or _make_sample_image(tmp_dir, args.format)
+        print(f"{args.uploads} concurrent uploads of {os.path.basename(image_path)} ({os.path.getsize(image_path) / 1e6:.1f} MB)")
+        print(f"{'mode':<16} {'decodes':>8} {'buffers MB':>11} {'peak RSS MB':>12} {'+RSS MB':>8} {'seconds':>8}")
+        for mode in args.modes:
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--uploads", str(args.uploads), "--worker", mode, image_path],
+                capture_output=True, text=True, check=True
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{mode:<16} {stats['decode_slots']:>8} {stats['baseline_rss_mb']:>11.0f} {stats['peak_rss_mb']:>12.0f} "
+                  f"{stats['delta_rss_mb']:>8.0f} {stats['seconds']:>8.1f}{'  (' + str(stats['errors']) + ' failed)' if stats['errors'] else ''}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Checks the trigger-maintained dashboard counters (user_stats) against a full recount.
+
+    python scripts/check_dashboard_stats.py [--db data/database.db] [--repair]
+
+Exits with status 1 if any user's counters differ, unless --repair rebuilds them.
+"""
+import argparse
+import os
+import sys
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import DATABASE_NAME, init_db
+from services.database_service import DatabaseService
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DATABASE_NAME, help="Database file to check")
+    parser.add_argument("--repair", action="store_true", help="Rebuild the counters if they differ")
+    args = parser.parse_args()
+
+    init_db(args.db)
+    db_service = DatabaseService(args.db)
+    mismatches = db_service.check_dashboard_stats()
+    for mismatch in mismatches:
+        print(f"user {mismatch['user_id']}: stored {mismatch['stored']} != actual {mismatch['actual']}")
+    if not mismatches:
+        print("Dashboard counters are consistent.")
+        return 0
+    if args.repair:
+        if db_service.rebuild_dashboard_stats() and not db_service.check_dashboard_stats():
+            print(f"Rebuilt counters; {len(mismatches)} user(s) repaired.")
+            return 0
+        print("Rebuild failed.")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
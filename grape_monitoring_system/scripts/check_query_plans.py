@@ -0,0 +1,131 @@
+"""
+Runs every DatabaseService query against a seeded temporary database and checks its query plan.
+
+    python scripts/check_query_plans.py
+
+Each statement the service executes is captured with a trace callback and re-run under
+EXPLAIN QUERY PLAN. The script exits with status 1 if any plan contains a full table scan
+(a SCAN step that doesn't use an index), so it can run in CI after schema or query changes.
+Public DatabaseService methods that aren't exercised below are listed as a reminder to add them.
+"""
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import date, datetime
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import init_db, ConnectionPool
+from models.user import User
+from models.analysis import Analysis
+from models.recommendation import Recommendation
+from services.database_service import DatabaseService
+
+FULL_SCAN = re.compile(r"\bSCAN (\w+)(?: AS \w+)?$")
+MATERIALIZED = re.compile(r"\b(?:MATERIALIZE|CO-ROUTINE) (\w+)")
+TRACED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+# Offline maintenance that is expected to read whole tables
+MAINTENANCE_METHODS = {"close_connection", "check_dashboard_stats", "rebuild_dashboard_stats"}
+
+class TracingPool(ConnectionPool):
+    """
+    Connection pool that records every statement its connections execute.
+    """
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.statements = []
+
+    def _acquire(self) -> sqlite3.Connection:
+        conn = super()._acquire()
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def _trace(self, statement: str) -> None:
+        statement = " ".join(statement.split())
+        if statement.upper().startswith(TRACED_STATEMENTS) and not statement.upper().startswith("EXPLAIN"):
+            self.statements.append(statement)
+
+def exercise(db_service: DatabaseService) -> set:
+    """
+    Calls each DatabaseService query once with realistic arguments; returns the method names called.
+    """
+    user_id = db_service.add_user(User(name="Plan Check", email="plan@example.com", password_hash="x"))
+    analysis_id = db_service.add_analysis(Analysis(user_id=user_id, image_path="plan.jpg", disease_detected="Black Rot", confidence_score=0.9, image_phash="00ff00ff00ff00ff"))
+    db_service.add_recommendation(Recommendation(analysis_id=analysis_id, recommendation_type="prevention", description="x", priority=3, implementation_date=date.today()))
+    db_service.add_follow_up(analysis_id, "pending", "check leaves")
+    question_id = db_service.add_question(user_id, "Plan", "Question?")
+    db_service.add_answer(question_id, user_id, "Answer.")
+    db_service.save_analysis_with_recommendations(
+        Analysis(user_id=user_id, image_path="plan2.jpg", disease_detected="Esca", confidence_score=0.6),
+        [Recommendation(analysis_id=None, recommendation_type="treatment", description="y", priority=4)],
+        follow_up=("pending", "first check")
+    )
+
+    calls = {
+        "get_user_by_id": lambda: db_service.get_user_by_id(user_id),
+        "get_user_by_email": lambda: db_service.get_user_by_email("plan@example.com"),
+        "update_user_settings": lambda: db_service.update_user_settings(user_id, "Plan Check", "plan@example.com", None, None, True),
+        "get_analysis_by_id": lambda: db_service.get_analysis_by_id(analysis_id),
+        "get_analyses_by_ids": lambda: db_service.get_analyses_by_ids([analysis_id, analysis_id + 1]),
+        "get_gemini_response": lambda: db_service.get_gemini_response(analysis_id),
+        "get_analyses_by_user_id": lambda: db_service.get_analyses_by_user_id(user_id),
+        "get_analysis_phashes": lambda: db_service.get_analysis_phashes(),
+        "get_recommendations_by_analysis_id": lambda: db_service.get_recommendations_by_analysis_id(analysis_id),
+        "get_follow_ups_by_analysis_id": lambda: db_service.get_follow_ups_by_analysis_id(analysis_id),
+        "get_recommendations_for_analyses": lambda: db_service.get_recommendations_for_analyses([analysis_id, analysis_id + 1]),
+        "get_follow_ups_for_analyses": lambda: db_service.get_follow_ups_for_analyses([analysis_id, analysis_id + 1]),
+        "get_analyses_page": lambda: db_service.get_analyses_page(user_id, 20, ("2099-01-01 00:00:00", 10**9)),
+        "get_analyses_with_details": lambda: db_service.get_analyses_with_details(user_id, 20),
+        "get_questions": lambda: db_service.get_questions(),
+        "get_questions_page": lambda: db_service.get_questions_page(20, ("2099-01-01 00:00:00", 10**9)),
+        "get_question_by_id": lambda: db_service.get_question_by_id(question_id),
+        "get_answers_for_question": lambda: db_service.get_answers_for_question(question_id),
+        "search_analyses": lambda: db_service.search_analyses(user_id, "black rot"),
+        "search_forum": lambda: db_service.search_forum("plan"),
+        "get_dashboard_stats": lambda: db_service.get_dashboard_stats(user_id),
+        "get_analysis_rollups": lambda: db_service.get_analysis_rollups(user_id, "week", date(2024, 1, 1), date.today()),
+        "get_released_images": lambda: db_service.get_released_images(datetime.utcnow(), 100, "a"),
+        "get_image_ref_counts": lambda: db_service.get_image_ref_counts(["plan.jpg", "other.jpg"]),
+        "forget_image_ref": lambda: db_service.forget_image_ref("other.jpg"),
+        "delete_analysis": lambda: db_service.delete_analysis(analysis_id),
+    }
+    for call in calls.values():
+        call()
+    return set(calls) | {"add_user", "add_analysis", "add_recommendation", "add_follow_up", "add_question", "add_answer", "save_analysis_with_recommendations"}
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "plans.db")
+        init_db(db_path)
+        db_service = DatabaseService(db_path)
+        db_service.pool = TracingPool(db_path)
+        exercised = exercise(db_service)
+
+        failures = 0
+        conn = sqlite3.connect(db_path)
+        for statement in dict.fromkeys(db_service.pool.statements): # Unique, in execution order
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+            # Reading back a materialized subquery (e.g. the top FTS hits) is not a table scan
+            subqueries = {m.group(1) for m in map(MATERIALIZED.search, plan) if m}
+            scans = [step for step in plan if (scan := FULL_SCAN.search(step)) and scan.group(1) not in subqueries]
+            print(f"{'FULL SCAN' if scans else 'ok':<10} {statement}")
+            for step in plan:
+                print(f"{'':<12}{step}")
+            failures += bool(scans)
+        conn.close()
+        db_service.close_connection()
+
+    public_methods = {name for name in vars(DatabaseService) if not name.startswith('_') and callable(getattr(DatabaseService, name))}
+    missing = sorted(public_methods - exercised - MAINTENANCE_METHODS)
+    if missing:
+        print(f"\nNot exercised (add them to exercise()): {', '.join(missing)}")
+    print(f"\n{failures} statement(s) with a full table scan.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Checks that full-text search finds Turkish text from ASCII queries, on a seeded temporary database.
+
+    python scripts/check_search.py
+
+Analyses, recommendations, forum questions and answers are seeded with words that use ı, ş, ü, ğ
+and İ; each query below, typed without them, must find its row. Exits with status 1 otherwise.
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import init_db
+from models.user import User
+from models.analysis import Analysis
+from models.recommendation import Recommendation
+from services.database_service import DatabaseService
+
+# (source, ASCII query)
+ANALYSIS_QUERIES = [("analysis", "yaniklik"), ("analysis", "yanikligi"), ("analysis", "sari"), ("recommendation", "bakir"), ("recommendation", "kukurt")]
+FORUM_QUERIES = [("question", "bulamaci"), ("question", "ilaclama"), ("answer", "kukurt"), ("answer", "bakir")]
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "search.db")
+        init_db(db_path)
+        db_service = DatabaseService(db_path)
+        user_id = db_service.add_user(User(name="Arama", email="arama@example.com", password_hash="x"))
+        analysis_id = db_service.add_analysis(Analysis(
+            user_id=user_id, image_path="search.jpg", disease_detected="Yaprak yanıklığı", confidence_score=0.9,
+            detailed_description="Yaprak kenarlarında yanıklık ve sarı lekeler görülüyor."
+        ))
+        for description in ("Bakır bazlı fungisit uygulayın.", "Kükürt ile ilaçlama yapın."):
+            db_service.add_recommendation(Recommendation(
+                analysis_id=analysis_id, recommendation_type="treatment", description=description, priority=1, implementation_date=date.today()
+            ))
+        question_id = db_service.add_question(user_id, "Bordo bulamacı ne zaman?", "İLAÇLAMA takvimi hakkında soru.")
+        db_service.add_answer(question_id, user_id, "Önce kükürt, sonra bakır kullanın.")
+
+        failures = 0
+        for source, query in ANALYSIS_QUERIES:
+            found = any(hit["source"] == source for hit in db_service.search_analyses(user_id, query))
+            print(f"{'ok' if found else 'NOT FOUND':<10} analyses  {query!r} ({source})")
+            failures += not found
+        for source, query in FORUM_QUERIES:
+            found = any(hit["source"] == source for hit in db_service.search_forum(query))
+            print(f"{'ok' if found else 'NOT FOUND':<10} forum     {query!r} ({source})")
+            failures += not found
+        db_service.close_connection()
+
+    print(f"\n{failures} query(ies) without a match.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
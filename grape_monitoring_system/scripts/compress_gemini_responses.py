@@ -0,0 +1,117 @@
+"""
+Compresses analyses.gemini_response values that are still stored as plain TEXT and prints a size/latency report.
+
+    python scripts/compress_gemini_responses.py [--db data/database.db] [--batch-size 500] [--dry-run] [--vacuum]
+
+Rows are converted in id order, one transaction per batch, so the migration can be interrupted
+and re-run. Every blob is checked to decompress to the original text before it is written.
+Space freed inside the file is only returned to the filesystem with --vacuum.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import zlib
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import DATABASE_NAME, init_db, connect
+from config.settings import TEXT_COMPRESSION_LEVEL
+from services.database_service import DatabaseService
+from utils.compression import compress_text, decompress_text
+
+def file_size(db_path: str) -> int:
+    return sum(os.path.getsize(path) for path in (db_path, db_path + "-wal") if os.path.exists(path))
+
+def column_bytes(conn) -> int:
+    return conn.execute("SELECT COALESCE(SUM(LENGTH(CAST(gemini_response AS BLOB))), 0) FROM analyses").fetchone()[0]
+
+def median_us(samples: list) -> str:
+    return f"{statistics.median(samples) * 1e6:.0f} µs" if samples else "n/a"
+
+def history_page_latency(db_path: str, columns: str, user_id: int, repeat: int = 50) -> float:
+    # A cold connection per run would measure the OS cache; the same connection measures row decoding
+    conn = connect(db_path)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(f"SELECT {columns} FROM analyses WHERE user_id = ? ORDER BY analysis_date DESC, id DESC LIMIT 20", (user_id,)).fetchall()
+    conn.close()
+    return (time.perf_counter() - start) / repeat
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DATABASE_NAME, help="Database file to migrate")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what compression would save")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+
+    init_db(args.db)
+    conn = connect(args.db)
+    size_before = file_size(args.db)
+    stored_before = column_bytes(conn)
+
+    rows = compressed = plain_bytes = blob_bytes = zlib_only_bytes = 0
+    compress_times, decompress_times = [], []
+    last_id = 0
+    while True:
+        batch = conn.execute(
+            "SELECT id, gemini_response FROM analyses WHERE id > ? AND typeof(gemini_response) = 'text' ORDER BY id LIMIT ?",
+            (last_id, args.batch_size)
+        ).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        updates = []
+        for analysis_id, text in batch:
+            rows += 1
+            start = time.perf_counter()
+            value = compress_text(text)
+            compress_times.append(time.perf_counter() - start)
+            if isinstance(value, str):
+                continue # Too short or incompressible: stays plain TEXT
+            start = time.perf_counter()
+            if decompress_text(value) != text:
+                print(f"Analysis {analysis_id}: round trip mismatch, left uncompressed.")
+                continue
+            decompress_times.append(time.perf_counter() - start)
+            raw = text.encode("utf-8")
+            plain_bytes += len(raw)
+            blob_bytes += len(value)
+            zlib_only_bytes += len(zlib.compress(raw, TEXT_COMPRESSION_LEVEL))
+            updates.append((value, analysis_id))
+        compressed += len(updates)
+        if updates and not args.dry_run:
+            with conn:
+                conn.executemany("UPDATE analyses SET gemini_response = ? WHERE id = ?", updates)
+
+    print(f"Rows scanned:               {rows} (plain TEXT)")
+    print(f"Rows compressed:            {compressed}{' (dry run, nothing written)' if args.dry_run else ''}")
+    if compressed:
+        print(f"Compressed rows:            {plain_bytes:,} -> {blob_bytes:,} bytes ({blob_bytes / plain_bytes:.1%})")
+        print(f"  zlib without dictionary:  {zlib_only_bytes:,} bytes ({zlib_only_bytes / plain_bytes:.1%})")
+        print(f"Compress / decompress:      {median_us(compress_times)} / {median_us(decompress_times)} per row (median)")
+    if not args.dry_run:
+        print(f"gemini_response column:     {stored_before:,} -> {column_bytes(conn):,} bytes")
+    busiest = conn.execute("SELECT user_id FROM analyses GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    conn.close()
+
+    if busiest:
+        full = history_page_latency(args.db, "*", busiest[0])
+        listed = history_page_latency(args.db, DatabaseService.ANALYSIS_LIST_COLUMNS, busiest[0])
+        print(f"History page (20 rows):     {full * 1000:.2f} ms with gemini_response, {listed * 1000:.2f} ms without")
+
+    if args.vacuum and not args.dry_run:
+        conn = connect(args.db)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        conn.close()
+    print(f"Database file:              {size_before:,} -> {file_size(args.db):,} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Moves legacy flat uploads (<UPLOAD_DIR>/<timestamp>_<name>) into the content-addressed image store
+and repoints analyses.image_path at the stored copies.
+
+    python scripts/migrate_uploads.py [--db data/database.db] [--uploads-dir DIR] [--dry-run] [--keep-legacy]
+
+Run it from the directory the app runs from: image paths in the database are relative to it.
+Duplicate uploads collapse into one stored file; image_refs is kept up to date by its triggers.
+Legacy files are deleted once no analysis points at them any more (unless --keep-legacy).
+Legacy files that no analysis ever referenced are left for the storage cleanup.
+"""
+import argparse
+import os
+import sys
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import DATABASE_NAME, init_db, connect
+from config.settings import UPLOAD_DIR
+from services.image_service import ImageService
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DATABASE_NAME, help="Database file to migrate")
+    parser.add_argument("--uploads-dir", default=UPLOAD_DIR, help="Upload directory (legacy files and the store)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+    parser.add_argument("--keep-legacy", action="store_true", help="Don't delete legacy files after migrating them")
+    args = parser.parse_args()
+
+    init_db(args.db)
+    image_service = ImageService(args.uploads_dir)
+    conn = connect(args.db)
+    referenced = conn.execute("SELECT image_path, COUNT(*) FROM analyses GROUP BY image_path").fetchall()
+
+    migrated_rows = missing = legacy_bytes = 0
+    stored = {} # new path -> size, for the unique count and store size
+    migrated_files = set()
+    for image_path, row_count in referenced:
+        if image_service.is_stored_path(image_path):
+            continue
+        local_path = image_path.replace("\\", "/") # Paths saved on Windows
+        if not os.path.isfile(local_path):
+            print(f"Missing file, left as is: {image_path} ({row_count} analyses)")
+            missing += 1
+            continue
+        with open(local_path, "rb") as f:
+            image_data = f.read()
+        if args.dry_run:
+            new_path = image_service.stored_path_for(image_data, local_path)
+        else:
+            new_path = image_service.save_image(image_data, local_path)
+            with conn:
+                conn.execute("UPDATE analyses SET image_path = ? WHERE image_path = ?", (new_path, image_path))
+        legacy_bytes += len(image_data)
+        stored[new_path] = len(image_data)
+        migrated_files.add(os.path.normpath(local_path))
+        migrated_rows += row_count
+
+    deleted = left = left_bytes = 0
+    for entry in os.scandir(args.uploads_dir):
+        if not entry.is_file() or entry.name.startswith(".tmp-"):
+            continue
+        if os.path.normpath(entry.path) in migrated_files:
+            if not args.dry_run and not args.keep_legacy:
+                os.remove(entry.path)
+                deleted += 1
+        else:
+            left += 1
+            left_bytes += entry.stat().st_size
+    conn.close()
+
+    print(f"Analyses repointed:        {migrated_rows}{' (dry run, nothing written)' if args.dry_run else ''}")
+    print(f"Legacy files migrated:     {len(migrated_files)} ({legacy_bytes:,} bytes)")
+    print(f"Unique stored images:      {len(stored)} ({sum(stored.values()):,} bytes)")
+    print(f"Legacy files deleted:      {deleted}")
+    print(f"Unreferenced legacy files: {left} ({left_bytes:,} bytes), left for storage cleanup")
+    if missing:
+        print(f"Referenced files missing:  {missing}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
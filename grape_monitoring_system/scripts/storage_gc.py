@@ -0,0 +1,66 @@
+"""
+Removes uploaded images (and thumbnails) that no analysis references any more.
+
+    python scripts/storage_gc.py [--db data/database.db] [--max-batches 10] [--delete] [--dry-run] [--purge-quarantine]
+
+Run it from the directory the app runs from (image paths are relative to it), e.g. nightly from cron.
+Each run continues the store scan where the previous one stopped; --max-batches bounds how long
+one run takes on a large store. Orphans are moved to <UPLOAD_DIR>/quarantine unless --delete.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Make the project packages (core, config, ...) importable when run as a script
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from config.database import DATABASE_NAME, init_db
+from config.settings import UPLOAD_DIR, STORAGE_GC_GRACE_SECONDS, STORAGE_GC_BATCH_SIZE, STORAGE_GC_QUARANTINE
+from services.database_service import DatabaseService
+from services.image_service import ImageService
+from services.storage_gc import StorageGarbageCollector
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DATABASE_NAME, help="Database file")
+    parser.add_argument("--uploads-dir", default=UPLOAD_DIR, help="Upload directory (the image store)")
+    parser.add_argument("--grace-hours", type=float, default=STORAGE_GC_GRACE_SECONDS / 3600, help="Leave files younger than this alone")
+    parser.add_argument("--batch-size", type=int, default=STORAGE_GC_BATCH_SIZE, help="Files per checkpointed batch")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches per pass (default: finish)")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--delete", action="store_true", help="Delete orphans instead of quarantining them")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--purge-quarantine", action="store_true", help="Also delete quarantined files past their retention")
+    parser.add_argument("--restart", action="store_true", help="Start the store scan from the beginning")
+    args = parser.parse_args()
+
+    init_db(args.db)
+    collector = StorageGarbageCollector(
+        DatabaseService(args.db), ImageService(args.uploads_dir), grace_seconds=args.grace_hours * 3600,
+        batch_size=args.batch_size, quarantine=STORAGE_GC_QUARANTINE and not args.delete,
+        dry_run=args.dry_run, pause_seconds=args.pause
+    )
+    if args.restart:
+        collector.reset_checkpoint()
+
+    start = time.perf_counter()
+    collector.collect_released(args.max_batches)
+    finished = collector.scan_store(args.max_batches)
+    if args.purge_quarantine:
+        collector.purge_quarantine()
+    stats = collector.stats
+
+    print(f"{'Dry run: nothing was changed. ' if args.dry_run else ''}Finished in {time.perf_counter() - start:.1f}s")
+    print(f"Released images checked: {stats['released_checked']} ({stats['refs_forgotten']} references dropped)")
+    print(f"Store files scanned:     {stats['files_scanned']} ({'scan complete' if finished else 'scan continues next run'})")
+    print(f"Orphans removed:         {stats['orphans']}")
+    print(f"Reclaimed:               {stats['deleted_bytes']:,} bytes deleted, {stats['quarantined_bytes']:,} bytes quarantined")
+    if args.purge_quarantine:
+        print(f"Quarantine purged:       {stats['purged_bytes']:,} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
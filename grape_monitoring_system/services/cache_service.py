@@ -0,0 +1,136 @@
+import sqlite3
+import json
+import time
+import threading
+from config.database import DATABASE_NAME, connect
+from config.settings import CACHE_TOUCH_TTL_FRACTION, CACHE_TOUCH_MAX_INTERVAL_SECONDS
+from typing import Optional, Any
+
+class CacheService:
+    """
+    Persistent key/value cache stored in the cache_entries table.
+    Entries live in a namespace, expire after a TTL and the least recently
+    used ones are evicted once the namespace grows past max_entries.
+    Recency is approximate: a hit only records itself once the previous record is
+    touch_interval old, so reads don't turn into write transactions.
+    """
+    def __init__(self, namespace: str, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None, db_path: str = DATABASE_NAME):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.touch_interval = min(CACHE_TOUCH_MAX_INTERVAL_SECONDS, ttl_seconds * CACHE_TOUCH_TTL_FRACTION) if ttl_seconds else CACHE_TOUCH_MAX_INTERVAL_SECONDS
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # Shared across Streamlit script threads via st.cache_resource, guarded by self._lock
+        if self._conn is None:
+            self._conn = connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for key, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._get_connection()
+                row = conn.execute(
+                    "SELECT value, expires_at, last_accessed FROM cache_entries WHERE namespace = ? AND cache_key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is None or (row[1] is not None and row[1] <= now):
+                    self.misses += 1
+                    return None
+                if row[2] is None or now - row[2] >= self.touch_interval:
+                    conn.execute(
+                        "UPDATE cache_entries SET last_accessed = ? WHERE namespace = ? AND cache_key = ?",
+                        (now, self.namespace, key)
+                    )
+                    conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            except (sqlite3.Error, json.JSONDecodeError) as e:
+                print(f"Cache read error ({self.namespace}): {e}")
+                self.misses += 1
+                return None
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Stores a JSON-serializable value. ttl_seconds overrides the namespace TTL for this key.
+        """
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            try:
+                conn = self._get_connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, cache_key, value, created_at, expires_at, last_accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), now, expires_at, now)
+                )
+                self._evict(conn, now)
+                conn.commit()
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"Cache write error ({self.namespace}): {e}")
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            try:
+                conn = self._get_connection()
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND cache_key = ?", (self.namespace, key))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Cache delete error ({self.namespace}): {e}")
+
+    def delete_prefix(self, prefix: str) -> None:
+        """
+        Removes every entry whose key starts with prefix.
+        """
+        with self._lock:
+            try:
+                conn = self._get_connection()
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND substr(cache_key, 1, ?) = ?",
+                    (self.namespace, len(prefix), prefix)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Cache delete error ({self.namespace}): {e}")
+
+    def clear(self) -> None:
+        """
+        Removes every entry in this namespace.
+        """
+        with self._lock:
+            try:
+                conn = self._get_connection()
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Cache clear error ({self.namespace}): {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, now)
+        )
+        if self.max_entries is not None:
+            # Drop the least recently used entries beyond max_entries
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND cache_key IN ("
+                "SELECT cache_key FROM cache_entries WHERE namespace = ? ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries)
+            )
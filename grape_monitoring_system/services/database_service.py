@@ -1,240 +1,558 @@
 import sqlite3
-from config.database import DATABASE_NAME
+import atexit
+import re
+import threading
+from concurrent.futures import Future
+from config.database import DATABASE_NAME, ConnectionPool, ACTIVE_FOLLOW_UP_STATUSES_SQL, rebuild_user_stats, rebuild_analysis_rollups, fold_for_search
 from models.user import User
 from models.analysis import Analysis
 from models.recommendation import Recommendation
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Callable, Any, Hashable, Union
+from config.settings import WRITE_BEHIND_ENABLED, COMPRESS_GEMINI_RESPONSES
+from services.write_behind import WriteBehindQueue
+from utils.compression import compress_text, decompress_text
 
 class DatabaseService:
-    def __init__(self):
-        self.conn = None
-
-    def _get_connection(self) -> sqlite3.Connection:
-        if self.conn is None:
-            self.conn = sqlite3.connect(DATABASE_NAME)
-            self.conn.row_factory = sqlite3.Row # Allows accessing columns by name
-        else:
-            # Check if the connection is still open/valid by trying a simple operation
-            try:
-                self.conn.execute("SELECT 1").fetchone()
-            except (sqlite3.ProgrammingError, sqlite3.OperationalError):
-                # If connection is closed or invalid, reopen it
-                self.conn = sqlite3.connect(DATABASE_NAME)
-                self.conn.row_factory = sqlite3.Row
-        return self.conn
+    IN_LIST_CHUNK_SIZE = 500
+    # Every analyses column except gemini_response: list pages leave the (compressed) raw
+    # response on disk and load it on demand with get_gemini_response
+    ANALYSIS_LIST_COLUMNS = "id, user_id, image_path, disease_detected, confidence_score, analysis_date, detailed_description, possible_causes, immediate_actions, image_phash"
+
+    def __init__(self, db_path: str = DATABASE_NAME, write_behind: bool = WRITE_BEHIND_ENABLED, session_key: Optional[Callable[[], Hashable]] = None):
+        """
+        With write_behind, writes go through a WriteBehindQueue and are group-committed by one writer thread.
+        session_key identifies the caller's session for read-your-writes (defaults to the current thread).
+        """
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
+        self.session_key = session_key or threading.get_ident
+        self.write_queue = None
+        if write_behind:
+            self.write_queue = WriteBehindQueue(db_path)
+            atexit.register(self.write_queue.close) # Flush queued writes on shutdown
+
+    def _connection(self):
+        """
+        Borrows a pooled connection for the duration of a with-block.
+        In write-behind mode it first waits for this session's queued writes, so reads see them.
+        """
+        if self.write_queue is not None:
+            self.write_queue.barrier(self.session_key())
+        return self.pool.connection()
+
+    def _write(self, operation: Callable[[sqlite3.Connection], Any], wait: bool = True) -> Union[Any, Future]:
+        """
+        Runs operation(conn) in a transaction and returns its result. In write-behind mode the
+        operation is queued instead; wait=False returns the Future rather than blocking on it.
+        Database errors are raised (or set on the Future).
+        """
+        if self.write_queue is None:
+            with self._connection() as conn:
+                try:
+                    result = operation(conn)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            if wait:
+                return result
+            future = Future()
+            future.set_result(result)
+            return future
+        future = self.write_queue.submit(operation, self.session_key())
+        return future.result() if wait else future
 
     def close_connection(self):
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        if self.write_queue is not None:
+            self.write_queue.close()
+        self.pool.close_all()
 
     # User Operations
     def add_user(self, user: User) -> Optional[int]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        def insert(conn: sqlite3.Connection) -> int:
+            return conn.execute("INSERT INTO users (name, email, password_hash, phone, location) VALUES (?, ?, ?, ?, ?)",
+                                (user.name, user.email, user.password_hash, user.phone, user.location)).lastrowid
         try:
-            cursor.execute("INSERT INTO users (name, email, password_hash, phone, location) VALUES (?, ?, ?, ?, ?)",
-                           (user.name, user.email, user.password_hash, user.phone, user.location))
-            conn.commit()
-            return cursor.lastrowid
+            return self._write(insert)
         except sqlite3.IntegrityError as e:
             print(f"Error adding user: {e}")
             return None
 
     def get_user_by_id(self, user_id: int) -> Optional[User]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
-        if row:
-            user_data = dict(row)
-            if 'created_at' in user_data and user_data['created_at']:
-                user_data['created_at'] = datetime.strptime(user_data['created_at'], '%Y-%m-%d %H:%M:%S')
-            return User(**user_data)
-        return None
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+            row = cursor.fetchone()
+            if row:
+                user_data = dict(row)
+                if 'created_at' in user_data and user_data['created_at']:
+                    user_data['created_at'] = datetime.strptime(user_data['created_at'], '%Y-%m-%d %H:%M:%S')
+                return User(**user_data)
+            return None
 
     def get_user_by_email(self, email: str) -> Optional[User]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        row = cursor.fetchone()
-        if row:
-            user_data = dict(row)
-            if 'created_at' in user_data and user_data['created_at']:
-                user_data['created_at'] = datetime.strptime(user_data['created_at'], '%Y-%m-%d %H:%M:%S')
-            return User(**user_data)
-        return None
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+            row = cursor.fetchone()
+            if row:
+                user_data = dict(row)
+                if 'created_at' in user_data and user_data['created_at']:
+                    user_data['created_at'] = datetime.strptime(user_data['created_at'], '%Y-%m-%d %H:%M:%S')
+                return User(**user_data)
+            return None
 
     def update_user_settings(self, user_id: int, name: str, email: str, phone: Optional[str], location: Optional[str], receive_email_notifications: bool) -> bool:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
+        def update(conn: sqlite3.Connection) -> None:
+            conn.execute("""
                 UPDATE users
                 SET name = ?, email = ?, phone = ?, location = ?, receive_email_notifications = ?
                 WHERE id = ?
             """, (name, email, phone, location, receive_email_notifications, user_id))
-            conn.commit()
+        try:
+            self._write(update)
             return True
         except sqlite3.Error as e:
             print(f"Error updating user settings for user_id {user_id}: {e}")
             return False
 
     # Analysis Operations
-    def add_analysis(self, analysis: Analysis) -> Optional[int]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO analyses (user_id, image_path, disease_detected, confidence_score, gemini_response, detailed_description, possible_causes, immediate_actions) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (analysis.user_id, analysis.image_path, analysis.disease_detected, analysis.confidence_score, analysis.gemini_response, analysis.detailed_description, analysis.possible_causes, analysis.immediate_actions)
-        )
-        conn.commit()
-        return cursor.lastrowid
+    def add_analysis(self, analysis: Analysis, wait: bool = True) -> Union[Optional[int], Future]:
+        return self._write(lambda conn: self._insert_analysis(conn, analysis), wait)
+
+    def _insert_analysis(self, conn: sqlite3.Connection, analysis: Analysis) -> int:
+        gemini_response = compress_text(analysis.gemini_response) if COMPRESS_GEMINI_RESPONSES else analysis.gemini_response
+        return conn.execute(
+            "INSERT INTO analyses (user_id, image_path, disease_detected, confidence_score, gemini_response, detailed_description, possible_causes, immediate_actions, image_phash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (analysis.user_id, analysis.image_path, analysis.disease_detected, analysis.confidence_score, gemini_response, analysis.detailed_description, analysis.possible_causes, analysis.immediate_actions, analysis.image_phash)
+        ).lastrowid
 
     def get_analysis_by_id(self, analysis_id: int) -> Optional[Analysis]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM analyses WHERE id = ?", (analysis_id,))
-        row = cursor.fetchone()
-        if row:
-            analysis_data = dict(row)
-            if 'analysis_date' in analysis_data and analysis_data['analysis_date']:
-                analysis_data['analysis_date'] = datetime.strptime(analysis_data['analysis_date'], '%Y-%m-%d %H:%M:%S')
-            return Analysis(**analysis_data)
-        return None
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM analyses WHERE id = ?", (analysis_id,))
+            row = cursor.fetchone()
+            if row:
+                return self._row_to_analysis(row)
+            return None
+
+    def get_gemini_response(self, analysis_id: int) -> Optional[str]:
+        """
+        The raw Gemini response of one analysis, decompressed. List methods don't load it.
+        """
+        with self._connection() as conn:
+            row = conn.execute("SELECT gemini_response FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        return decompress_text(row['gemini_response']) if row else None
 
     def get_analyses_by_user_id(self, user_id: int) -> List[Analysis]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM analyses WHERE user_id = ? ORDER BY analysis_date DESC", (user_id,))
-        rows = cursor.fetchall()
-        converted_analyses = []
-        for row in rows:
-            analysis_data = dict(row)
-            if 'analysis_date' in analysis_data and analysis_data['analysis_date']:
-                analysis_data['analysis_date'] = datetime.strptime(analysis_data['analysis_date'], '%Y-%m-%d %H:%M:%S')
-            converted_analyses.append(Analysis(**analysis_data))
-        return converted_analyses
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {self.ANALYSIS_LIST_COLUMNS} FROM analyses WHERE user_id = ? ORDER BY analysis_date DESC", (user_id,))
+            return [self._row_to_analysis(row) for row in cursor.fetchall()]
+
+    def get_analyses_page(self, user_id: int, limit: int, cursor: Optional[tuple] = None) -> tuple[List[Analysis], Optional[tuple]]:
+        """
+        One page of a user's analyses, newest first, using keyset pagination on (analysis_date, id).
+        Pass the returned cursor to get the next page; it is None after the last page.
+        """
+        with self._connection() as conn:
+            if cursor is None:
+                rows = conn.execute(
+                    f"SELECT {self.ANALYSIS_LIST_COLUMNS} FROM analyses WHERE user_id = ? ORDER BY analysis_date DESC, id DESC LIMIT ?",
+                    (user_id, limit + 1)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {self.ANALYSIS_LIST_COLUMNS} FROM analyses WHERE user_id = ? AND (analysis_date, id) < (?, ?) ORDER BY analysis_date DESC, id DESC LIMIT ?",
+                    (user_id, cursor[0], cursor[1], limit + 1)
+                ).fetchall()
+        # One extra row tells us whether there is a next page
+        next_cursor = (rows[limit - 1]['analysis_date'], rows[limit - 1]['id']) if len(rows) > limit else None
+        return [self._row_to_analysis(row) for row in rows[:limit]], next_cursor
+
+    def get_analyses_by_ids(self, analysis_ids: List[int]) -> List[Analysis]:
+        """
+        Analyses for the given ids, in the order the ids are given (missing ids are skipped).
+        """
+        found = {}
+        with self._connection() as conn:
+            for chunk in self._chunks(list(dict.fromkeys(analysis_ids))):
+                placeholders = ", ".join("?" * len(chunk))
+                for row in conn.execute(f"SELECT {self.ANALYSIS_LIST_COLUMNS} FROM analyses WHERE id IN ({placeholders})", chunk).fetchall():
+                    found[row['id']] = self._row_to_analysis(row)
+        return [found[analysis_id] for analysis_id in analysis_ids if analysis_id in found]
+
+    def _row_to_analysis(self, row: sqlite3.Row) -> Analysis:
+        analysis_data = dict(row)
+        if 'analysis_date' in analysis_data and analysis_data['analysis_date']:
+            analysis_data['analysis_date'] = datetime.strptime(analysis_data['analysis_date'], '%Y-%m-%d %H:%M:%S')
+        if 'gemini_response' in analysis_data:
+            analysis_data['gemini_response'] = decompress_text(analysis_data['gemini_response'])
+        return Analysis(**analysis_data)
+
+    def get_analysis_phashes(self) -> List[tuple[int, int]]:
+        """
+        Returns (analysis_id, perceptual hash) pairs for every analysis with a usable result.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, image_phash FROM analyses WHERE image_phash IS NOT NULL AND disease_detected IS NOT NULL AND disease_detected != 'Unknown'")
+            return [(row['id'], int(row['image_phash'], 16)) for row in cursor.fetchall()]
 
     # Recommendation Operations
-    def add_recommendation(self, recommendation: Recommendation) -> Optional[int]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO recommendations (analysis_id, recommendation_type, description, priority, estimated_cost, implementation_date) VALUES (?, ?, ?, ?, ?, ?)",
-            (recommendation.analysis_id, recommendation.recommendation_type, recommendation.description, recommendation.priority, recommendation.estimated_cost, recommendation.implementation_date)
-        )
-        conn.commit()
-        return cursor.lastrowid
+    def add_recommendation(self, recommendation: Recommendation, wait: bool = True) -> Union[Optional[int], Future]:
+        def insert(conn: sqlite3.Connection) -> int:
+            return conn.execute(
+                "INSERT INTO recommendations (analysis_id, recommendation_type, description, priority, estimated_cost, implementation_date) VALUES (?, ?, ?, ?, ?, ?)",
+                (recommendation.analysis_id, recommendation.recommendation_type, recommendation.description, recommendation.priority, recommendation.estimated_cost, recommendation.implementation_date)
+            ).lastrowid
+        return self._write(insert, wait)
 
     def get_recommendations_by_analysis_id(self, analysis_id: int) -> List[Recommendation]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM recommendations WHERE analysis_id = ? ORDER BY priority DESC", (analysis_id,))
-        rows = cursor.fetchall()
-        converted_recommendations = []
-        for row in rows:
-            rec_data = dict(row)
-            if 'implementation_date' in rec_data and rec_data['implementation_date']:
-                # Assuming DATE is stored as YYYY-MM-DD
-                rec_data['implementation_date'] = datetime.strptime(rec_data['implementation_date'], '%Y-%m-%d').date()
-            converted_recommendations.append(Recommendation(**rec_data))
-        return converted_recommendations
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM recommendations WHERE analysis_id = ? ORDER BY priority DESC", (analysis_id,))
+            return [self._row_to_recommendation(row) for row in cursor.fetchall()]
+
+    def get_recommendations_for_analyses(self, analysis_ids: List[int]) -> dict[int, List[Recommendation]]:
+        """
+        Recommendations for many analyses in one query per IN_LIST_CHUNK_SIZE ids, grouped by analysis_id.
+        Every requested id is present in the result, with an empty list if it has no recommendations.
+        """
+        grouped = {analysis_id: [] for analysis_id in analysis_ids}
+        with self._connection() as conn:
+            for chunk in self._chunks(list(grouped)):
+                placeholders = ", ".join("?" * len(chunk))
+                cursor = conn.execute(f"SELECT * FROM recommendations WHERE analysis_id IN ({placeholders}) ORDER BY analysis_id, priority DESC", chunk)
+                for row in cursor.fetchall():
+                    grouped[row['analysis_id']].append(self._row_to_recommendation(row))
+        return grouped
+
+    def _row_to_recommendation(self, row: sqlite3.Row) -> Recommendation:
+        rec_data = dict(row)
+        if 'implementation_date' in rec_data and rec_data['implementation_date']:
+            # Assuming DATE is stored as YYYY-MM-DD
+            rec_data['implementation_date'] = datetime.strptime(rec_data['implementation_date'], '%Y-%m-%d').date()
+        return Recommendation(**rec_data)
+
+    def save_analysis_with_recommendations(self, analysis: Analysis, recommendations: List[Recommendation], follow_up: Optional[tuple[str, str]] = None, wait: bool = True) -> Union[Optional[tuple[int, List[int], Optional[int]]], Future]:
+        """
+        Persists an analysis, its recommendations and an optional (status, notes) follow-up in one transaction.
+        Sets analysis.id and each recommendation's analysis_id/id, and returns
+        (analysis_id, recommendation_ids, follow_up_id). On failure nothing is written and None is returned.
+        With wait=False (write-behind mode) a Future of the ids is returned instead.
+        """
+        def save(conn: sqlite3.Connection) -> tuple[int, List[int], Optional[int]]:
+            analysis_id = self._insert_analysis(conn, analysis)
+            conn.executemany(
+                "INSERT INTO recommendations (analysis_id, recommendation_type, description, priority, estimated_cost, implementation_date) VALUES (?, ?, ?, ?, ?, ?)",
+                [(analysis_id, rec.recommendation_type, rec.description, rec.priority, rec.estimated_cost, rec.implementation_date) for rec in recommendations]
+            )
+            # executemany doesn't report row ids; the analysis is new, so all of its rows are ours
+            recommendation_ids = [row[0] for row in conn.execute("SELECT id FROM recommendations WHERE analysis_id = ? ORDER BY id", (analysis_id,)).fetchall()]
+            follow_up_id = None
+            if follow_up is not None:
+                follow_up_id = self._insert_follow_up(conn, analysis_id, follow_up[0], follow_up[1])
+            return analysis_id, recommendation_ids, follow_up_id
+
+        def assign_ids(ids: tuple[int, List[int], Optional[int]]) -> None:
+            analysis.id = ids[0]
+            for rec, rec_id in zip(recommendations, ids[1]):
+                rec.analysis_id = ids[0]
+                rec.id = rec_id
+
+        if not wait:
+            future = self._write(save, wait=False)
+            future.add_done_callback(lambda done: assign_ids(done.result()) if done.exception() is None else None)
+            return future
+        try:
+            ids = self._write(save)
+        except sqlite3.Error as e:
+            print(f"Error saving analysis with recommendations: {e}")
+            return None
+        assign_ids(ids)
+        return ids
 
     # Follow-up Operations
-    def add_follow_up(self, analysis_id: int, status: str, notes: str) -> Optional[int]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
+    def add_follow_up(self, analysis_id: int, status: str, notes: str, wait: bool = True) -> Union[Optional[int], Future]:
+        return self._write(lambda conn: self._insert_follow_up(conn, analysis_id, status, notes), wait)
+
+    def _insert_follow_up(self, conn: sqlite3.Connection, analysis_id: int, status: str, notes: str) -> int:
+        return conn.execute(
             "INSERT INTO follow_ups (analysis_id, status, notes) VALUES (?, ?, ?)",
             (analysis_id, status, notes)
-        )
-        conn.commit()
-        return cursor.lastrowid
+        ).lastrowid
 
     def get_follow_ups_by_analysis_id(self, analysis_id: int):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM follow_ups WHERE analysis_id = ? ORDER BY follow_up_date DESC", (analysis_id,))
-        rows = cursor.fetchall()
-        converted_follow_ups = []
-        for row in rows:
-            fu_data = dict(row)
-            if 'follow_up_date' in fu_data and fu_data['follow_up_date']:
-                fu_data['follow_up_date'] = datetime.strptime(fu_data['follow_up_date'], '%Y-%m-%d %H:%M:%S')
-            converted_follow_ups.append(fu_data)
-        return converted_follow_ups
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM follow_ups WHERE analysis_id = ? ORDER BY follow_up_date DESC", (analysis_id,))
+            return [self._row_to_follow_up(row) for row in cursor.fetchall()]
+
+    def get_follow_ups_for_analyses(self, analysis_ids: List[int]) -> dict[int, List[dict]]:
+        """
+        Follow-ups for many analyses, grouped by analysis_id like get_recommendations_for_analyses.
+        """
+        grouped = {analysis_id: [] for analysis_id in analysis_ids}
+        with self._connection() as conn:
+            for chunk in self._chunks(list(grouped)):
+                placeholders = ", ".join("?" * len(chunk))
+                cursor = conn.execute(f"SELECT * FROM follow_ups WHERE analysis_id IN ({placeholders}) ORDER BY analysis_id, follow_up_date DESC", chunk)
+                for row in cursor.fetchall():
+                    grouped[row['analysis_id']].append(self._row_to_follow_up(row))
+        return grouped
+
+    def _row_to_follow_up(self, row: sqlite3.Row) -> dict:
+        fu_data = dict(row)
+        if 'follow_up_date' in fu_data and fu_data['follow_up_date']:
+            fu_data['follow_up_date'] = datetime.strptime(fu_data['follow_up_date'], '%Y-%m-%d %H:%M:%S')
+        return fu_data
+
+    def get_analyses_with_details(self, user_id: int, limit: int, cursor: Optional[tuple] = None) -> tuple[List[tuple[Analysis, List[Recommendation], List[dict]]], Optional[tuple]]:
+        """
+        A page of a user's analyses (see get_analyses_page) with their recommendations and follow-ups,
+        loaded in a fixed number of queries instead of two per analysis.
+        """
+        analyses, next_cursor = self.get_analyses_page(user_id, limit, cursor)
+        analysis_ids = [analysis.id for analysis in analyses]
+        recommendations = self.get_recommendations_for_analyses(analysis_ids)
+        follow_ups = self.get_follow_ups_for_analyses(analysis_ids)
+        return [(analysis, recommendations[analysis.id], follow_ups[analysis.id]) for analysis in analyses], next_cursor
+
+    def _chunks(self, ids: List[int]):
+        # Stay under SQLite's bound parameter limit (999 on older builds)
+        for start in range(0, len(ids), self.IN_LIST_CHUNK_SIZE):
+            yield ids[start:start + self.IN_LIST_CHUNK_SIZE]
 
     def delete_analysis(self, analysis_id: int) -> bool:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        try:
+        def delete(conn: sqlite3.Connection) -> None:
             # Delete related recommendations first
-            cursor.execute("DELETE FROM recommendations WHERE analysis_id = ?", (analysis_id,))
+            conn.execute("DELETE FROM recommendations WHERE analysis_id = ?", (analysis_id,))
             # Delete related follow-ups
-            cursor.execute("DELETE FROM follow_ups WHERE analysis_id = ?", (analysis_id,))
+            conn.execute("DELETE FROM follow_ups WHERE analysis_id = ?", (analysis_id,))
             # Then delete the analysis itself
-            cursor.execute("DELETE FROM analyses WHERE id = ?", (analysis_id,))
-            conn.commit()
+            conn.execute("DELETE FROM analyses WHERE id = ?", (analysis_id,))
+        try:
+            self._write(delete)
             print(f"Analysis {analysis_id} and its related data deleted successfully.")
             return True
         except sqlite3.Error as e:
             print(f"Error deleting analysis {analysis_id}: {e}")
-            conn.rollback()
             return False
 
     # Forum Operations (Questions)
-    def add_question(self, user_id: int, title: str, question_text: str) -> Optional[int]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def add_question(self, user_id: int, title: str, question_text: str, wait: bool = True) -> Union[Optional[int], Future]:
+        def insert(conn: sqlite3.Connection) -> int:
+            return conn.execute("INSERT INTO questions (user_id, title, question_text) VALUES (?, ?, ?)",
+                                (user_id, title, question_text)).lastrowid
         try:
-            cursor.execute("INSERT INTO questions (user_id, title, question_text) VALUES (?, ?, ?)",
-                           (user_id, title, question_text))
-            conn.commit()
-            return cursor.lastrowid
+            return self._write(insert, wait)
         except sqlite3.Error as e:
             print(f"Error adding question: {e}")
             return None
 
     def get_questions(self) -> List[dict]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        # Join with users table to get user name
-        cursor.execute("SELECT q.*, u.name as user_name FROM questions q JOIN users u ON q.user_id = u.id ORDER BY q.created_at DESC")
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            # Join with users table to get user name
+            cursor.execute("SELECT q.*, u.name as user_name FROM questions q JOIN users u ON q.user_id = u.id ORDER BY q.created_at DESC")
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    def get_questions_page(self, limit: int, cursor: Optional[tuple] = None) -> tuple[List[dict], Optional[tuple]]:
+        """
+        One page of forum questions, newest first, using keyset pagination on (created_at, id).
+        """
+        with self._connection() as conn:
+            if cursor is None:
+                rows = conn.execute(
+                    "SELECT q.*, u.name as user_name FROM questions q JOIN users u ON q.user_id = u.id ORDER BY q.created_at DESC, q.id DESC LIMIT ?",
+                    (limit + 1,)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT q.*, u.name as user_name FROM questions q JOIN users u ON q.user_id = u.id WHERE (q.created_at, q.id) < (?, ?) ORDER BY q.created_at DESC, q.id DESC LIMIT ?",
+                    (cursor[0], cursor[1], limit + 1)
+                ).fetchall()
+        next_cursor = (rows[limit - 1]['created_at'], rows[limit - 1]['id']) if len(rows) > limit else None
+        return [dict(row) for row in rows[:limit]], next_cursor
+
+    # Full-text search
+    SNIPPET_TOKENS = 12
+
+    def search_analyses(self, user_id: int, query: str, limit: int = 20) -> List[dict]:
+        """
+        Searches a user's analyses (disease, description, causes, actions) and their recommendations.
+        Returns up to limit dicts, best match first:
+        {analysis_id, analysis_date, disease_detected, snippet, source ('analysis' | 'recommendation'), rank}.
+        Snippets mark matched terms with ** for Markdown.
+        """
+        match = self._fts_query(query)
+        if match is None:
+            return []
+        hits = {}
+        try:
+            with self._connection() as conn:
+                # The owner token keeps the match (and the rank-ordered LIMIT) inside the FTS index;
+                # only the top rows are then joined back to their analyses
+                owned_match = f"owner:u{int(user_id)} AND ({match})"
+                analysis_rows = conn.execute(f"""
+                    SELECT a.id AS analysis_id, a.analysis_date, a.disease_detected, hit.snippet, hit.rank
+                    FROM (
+                        SELECT rowid, snippet(analyses_fts, -1, '**', '**', '…', {self.SNIPPET_TOKENS}) AS snippet, rank
+                        FROM analyses_fts WHERE analyses_fts MATCH ? ORDER BY rank LIMIT ?
+                    ) hit JOIN analyses a ON a.id = hit.rowid
+                """, (owned_match, limit)).fetchall()
+                recommendation_rows = conn.execute(f"""
+                    SELECT a.id AS analysis_id, a.analysis_date, a.disease_detected, hit.snippet, hit.rank
+                    FROM (
+                        SELECT rowid, snippet(recommendations_fts, 0, '**', '**', '…', {self.SNIPPET_TOKENS}) AS snippet, rank
+                        FROM recommendations_fts WHERE recommendations_fts MATCH ? ORDER BY rank LIMIT ?
+                    ) hit JOIN recommendations r ON r.id = hit.rowid JOIN analyses a ON a.id = r.analysis_id
+                """, (owned_match, limit)).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Error searching analyses: {e}")
+            return []
+        for source, rows in (("analysis", analysis_rows), ("recommendation", recommendation_rows)):
+            for row in rows:
+                hit = dict(row, source=source)
+                # One result per analysis, keeping its best-ranked match (bm25: lower is better)
+                if row['analysis_id'] not in hits or hit['rank'] < hits[row['analysis_id']]['rank']:
+                    hits[row['analysis_id']] = hit
+        return sorted(hits.values(), key=lambda hit: hit['rank'])[:limit]
+
+    def search_forum(self, query: str, limit: int = 20) -> List[dict]:
+        """
+        Searches forum questions (title, text) and answers. Returns up to limit questions, best match first,
+        as dicts like get_questions_page plus snippet, source ('question' | 'answer') and rank.
+        """
+        match = self._fts_query(query)
+        if match is None:
+            return []
+        hits = {}
+        try:
+            with self._connection() as conn:
+                question_rows = conn.execute(f"""
+                    SELECT q.*, u.name AS user_name, hit.snippet, hit.rank
+                    FROM (
+                        SELECT rowid, snippet(questions_fts, -1, '**', '**', '…', {self.SNIPPET_TOKENS}) AS snippet, rank
+                        FROM questions_fts WHERE questions_fts MATCH ? ORDER BY rank LIMIT ?
+                    ) hit JOIN questions q ON q.id = hit.rowid JOIN users u ON u.id = q.user_id
+                """, (match, limit)).fetchall()
+                answer_rows = conn.execute(f"""
+                    SELECT q.*, u.name AS user_name, hit.snippet, hit.rank
+                    FROM (
+                        SELECT rowid, snippet(answers_fts, 0, '**', '**', '…', {self.SNIPPET_TOKENS}) AS snippet, rank
+                        FROM answers_fts WHERE answers_fts MATCH ? ORDER BY rank LIMIT ?
+                    ) hit JOIN answers a ON a.id = hit.rowid
+                    JOIN questions q ON q.id = a.question_id JOIN users u ON u.id = q.user_id
+                """, (match, limit)).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Error searching forum: {e}")
+            return []
+        for source, rows in (("question", question_rows), ("answer", answer_rows)):
+            for row in rows:
+                hit = dict(row, source=source)
+                if row['id'] not in hits or hit['rank'] < hits[row['id']]['rank']:
+                    hits[row['id']] = hit
+        return sorted(hits.values(), key=lambda hit: hit['rank'])[:limit]
+
+    def _fts_query(self, text: str) -> Optional[str]:
+        """
+        Turns free text into a safe FTS5 query: every word must match, the last one as a prefix
+        (the user may still be typing it). Quoting each word keeps FTS5 syntax out of user input.
+        """
+        words = re.findall(r"\w+", fold_for_search(text or "")) # Folded like the indexed text
+        if not words:
+            return None
+        return " ".join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
 
     def get_question_by_id(self, question_id: int) -> Optional[dict]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT q.*, u.name as user_name FROM questions q JOIN users u ON q.user_id = u.id WHERE q.id = ?", (question_id,))
-        row = cursor.fetchone()
-        return dict(row) if row else None
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT q.*, u.name as user_name FROM questions q JOIN users u ON q.user_id = u.id WHERE q.id = ?", (question_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
 
     # Forum Operations (Answers)
-    def add_answer(self, question_id: int, user_id: int, answer_text: str) -> Optional[int]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def add_answer(self, question_id: int, user_id: int, answer_text: str, wait: bool = True) -> Union[Optional[int], Future]:
+        def insert(conn: sqlite3.Connection) -> int:
+            return conn.execute("INSERT INTO answers (question_id, user_id, answer_text) VALUES (?, ?, ?)",
+                                (question_id, user_id, answer_text)).lastrowid
         try:
-            cursor.execute("INSERT INTO answers (question_id, user_id, answer_text) VALUES (?, ?, ?)",
-                           (question_id, user_id, answer_text))
-            conn.commit()
-            return cursor.lastrowid
+            return self._write(insert, wait)
         except sqlite3.Error as e:
             print(f"Error adding answer: {e}")
             return None
 
     def get_answers_for_question(self, question_id: int) -> List[dict]:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        # Join with users table to get user name
-        cursor.execute("SELECT a.*, u.name as user_name FROM answers a JOIN users u ON a.user_id = u.id WHERE a.question_id = ? ORDER BY a.created_at ASC", (question_id,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            # Join with users table to get user name
+            cursor.execute("SELECT a.*, u.name as user_name FROM answers a JOIN users u ON a.user_id = u.id WHERE a.question_id = ? ORDER BY a.created_at ASC", (question_id,))
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
 
     def get_dashboard_stats(self, user_id: int) -> dict:
-        conn = self._get_connection()
+        """
+        Reads the trigger-maintained counters in user_stats (a single row).
+        """
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT total_analyses, unique_diseases, active_follow_ups FROM user_stats WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return {"total_analyses": 0, "unique_diseases": 0, "active_follow_ups": 0}
+        return dict(row)
+
+    def get_analysis_rollups(self, user_id: int, granularity: str, start_date: date, end_date: date) -> List[tuple]:
+        """
+        (period_start, disease, confidence_band, analysis_count) rows from the trigger-maintained
+        analysis_rollups table for periods starting between start_date and end_date (inclusive).
+        """
+        with self._connection() as conn:
+            return [tuple(row) for row in conn.execute(
+                "SELECT period_start, disease, confidence_band, analysis_count FROM analysis_rollups "
+                "WHERE user_id = ? AND granularity = ? AND period_start BETWEEN ? AND ?",
+                (user_id, granularity, start_date.isoformat(), end_date.isoformat())
+            ).fetchall()]
+
+    def check_dashboard_stats(self) -> List[dict]:
+        """
+        Compares the stored counters with a full recount; returns one entry per user that differs.
+        """
+        mismatches = []
+        with self._connection() as conn:
+            user_ids = [row[0] for row in conn.execute(
+                "SELECT user_id FROM analyses WHERE user_id IS NOT NULL UNION SELECT user_id FROM user_stats"
+            ).fetchall()]
+            for user_id in user_ids:
+                row = conn.execute(
+                    "SELECT total_analyses, unique_diseases, active_follow_ups FROM user_stats WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                stored = dict(row) if row else {"total_analyses": 0, "unique_diseases": 0, "active_follow_ups": 0}
+                actual = self._count_dashboard_stats(conn, user_id)
+                if stored != actual:
+                    mismatches.append({"user_id": user_id, "stored": stored, "actual": actual})
+        return mismatches
+
+    def rebuild_dashboard_stats(self) -> bool:
+        with self._connection() as conn:
+            try:
+                rebuild_user_stats(conn.cursor())
+                rebuild_analysis_rollups(conn.cursor())
+                conn.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error rebuilding dashboard stats: {e}")
+                conn.rollback()
+                return False
+
+    def _count_dashboard_stats(self, conn: sqlite3.Connection, user_id: int) -> dict:
+        """
+        The dashboard counters computed directly from analyses and follow_ups.
+        """
         cursor = conn.cursor()
 
         # Total analyses
@@ -245,9 +563,7 @@ class DatabaseService:
         cursor.execute("SELECT COUNT(DISTINCT disease_detected) FROM analyses WHERE user_id = ? AND disease_detected IS NOT NULL AND disease_detected != 'Unknown' AND disease_detected != 'Healthy'", (user_id,))
         unique_diseases = cursor.fetchone()[0]
 
-        # Placeholder for active follow-ups (requires a 'status' like 'pending' or 'in_progress')
-        # This query assumes 'follow_ups' table has a 'status' column and we want to count specific statuses
-        cursor.execute("SELECT COUNT(*) FROM follow_ups WHERE analysis_id IN (SELECT id FROM analyses WHERE user_id = ?) AND status IN ('pending', 'in_progress')", (user_id,))
+        cursor.execute(f"SELECT COUNT(*) FROM follow_ups WHERE analysis_id IN (SELECT id FROM analyses WHERE user_id = ?) AND status IN {ACTIVE_FOLLOW_UP_STATUSES_SQL}", (user_id,))
         active_follow_ups = cursor.fetchone()[0]
 
         return {
@@ -256,3 +572,39 @@ class DatabaseService:
             "active_follow_ups": active_follow_ups
         }
 
+    # Image references (storage cleanup)
+    def get_released_images(self, released_before: datetime, limit: int, after_path: str = "") -> List[str]:
+        """
+        Image paths no analysis points at any more, released before released_before,
+        in path order starting after after_path (keyset, so callers can walk them in batches).
+        """
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT image_path FROM image_refs WHERE ref_count = 0 AND image_path > ? AND released_at <= ? ORDER BY image_path LIMIT ?",
+                (after_path, released_before.strftime('%Y-%m-%d %H:%M:%S'), limit)
+            ).fetchall()
+        return [row['image_path'] for row in rows]
+
+    def get_image_ref_counts(self, image_paths: List[str]) -> dict[str, int]:
+        """
+        ref_count per image path; paths without an image_refs row are left out.
+        """
+        counts = {}
+        with self._connection() as conn:
+            for chunk in self._chunks(image_paths):
+                placeholders = ", ".join("?" * len(chunk))
+                for row in conn.execute(f"SELECT image_path, ref_count FROM image_refs WHERE image_path IN ({placeholders})", chunk).fetchall():
+                    counts[row['image_path']] = row['ref_count']
+        return counts
+
+    def forget_image_ref(self, image_path: str) -> bool:
+        """
+        Drops the image_refs row of an unreferenced image. Returns False if an analysis points at it again.
+        """
+        try:
+            return self._write(lambda conn: conn.execute(
+                "DELETE FROM image_refs WHERE image_path = ? AND ref_count = 0", (image_path,)
+            ).rowcount > 0)
+        except sqlite3.Error as e:
+            print(f"Error forgetting image reference {image_path}: {e}")
+            return False
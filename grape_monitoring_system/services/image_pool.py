@@ -0,0 +1,114 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Any, Optional, Union, BinaryIO
+from config.settings import IMAGE_PROCESS_POOL_WORKERS, IMAGE_PROCESS_POOL_MAX_PENDING
+from utils.image_utils import preprocess_image, compute_dhash
+
+class ImageProcessPool:
+    """
+    Runs CPU-bound image work (decode, resize, encode, perceptual hashing) in worker processes,
+    so it doesn't hold the GIL of the Streamlit server or a batch import.
+
+    At most max_pending jobs are queued or running; submit() blocks beyond that, which keeps the
+    image data waiting in the pipe to the workers bounded (backpressure). Workers are started with
+    'spawn' (forking a threaded Streamlit server is unsafe) and only import utils.image_utils.
+    Jobs are module-level functions (see the worker functions below) so they can be pickled.
+    """
+    def __init__(self, workers: Optional[int] = IMAGE_PROCESS_POOL_WORKERS, max_pending: Optional[int] = IMAGE_PROCESS_POOL_MAX_PENDING):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers # Keeps every worker busy while the next job is sent
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor_lock = threading.Lock()
+        self._executor = None
+        self._closed = False
+
+    def submit(self, fn: Callable[..., Any], *args) -> Future:
+        """
+        Schedules fn(*args) on a worker process and returns its Future. Blocks while max_pending jobs are in flight.
+        """
+        if self._closed:
+            raise RuntimeError("ImageProcessPool is closed.")
+        self._slots.acquire()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Runs fn(*args) on a worker process and returns its result. If a worker died (e.g. killed for
+        memory), the pool is replaced and the job retried once.
+        """
+        try:
+            return self.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._reset_executor()
+            return self.submit(fn, *args).result()
+
+    def close(self, wait: bool = True) -> None:
+        self._closed = True
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    @staticmethod
+    def picklable_source(image_source: Union[bytes, BinaryIO]) -> Union[bytes, str]:
+        """
+        What to send to a worker for image_source: the path of an open file on disk (the worker
+        reads it itself), otherwise the bytes. In-memory uploads hand over their buffer without a copy.
+        """
+        if isinstance(image_source, bytes):
+            return image_source
+        if isinstance(image_source, io.BufferedReader) and isinstance(image_source.name, str):
+            return os.path.abspath(image_source.name)
+        if isinstance(image_source, io.BytesIO):
+            return image_source.getvalue()
+        image_source.seek(0)
+        return image_source.read()
+
+# Worker functions: run in the pool's processes
+
+def preprocess_in_worker(image_source: Union[bytes, str], max_size: tuple[int, int], target_format: str, quality: int) -> bytes:
+    """
+    preprocess_image for image bytes or an image file path.
+    """
+    if isinstance(image_source, str):
+        with open(image_source, "rb") as f:
+            return preprocess_image(f, max_size=max_size, target_format=target_format, quality=quality)
+    return preprocess_image(image_source, max_size=max_size, target_format=target_format, quality=quality)
+
+def dhash_in_worker(image_data: bytes) -> int:
+    return compute_dhash(image_data)
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_image_process_pool() -> ImageProcessPool:
+    """
+    Returns the process-wide pool shared by every ImageService, creating it on first use.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ImageProcessPool()
+        return _shared_pool
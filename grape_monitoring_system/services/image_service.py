@@ -1,22 +1,159 @@
 import os
-from PIL import Image
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Union, BinaryIO
+from PIL import Image, features
 import io
+from config.settings import UPLOAD_DIR, IMAGE_STORE_SHARD_LEVELS, THUMBNAIL_SIZE, THUMBNAIL_QUALITY, THUMBNAIL_CACHE_MAX_ENTRIES, IMAGE_PROCESS_POOL_ENABLED
+from services.image_pool import get_image_process_pool, preprocess_in_worker, dhash_in_worker
+from utils.image_utils import preprocess_image, compute_dhash
+
+# File extension per detected image format; the format comes from the bytes, not the upload name,
+# so identical content always maps to the same path
+IMAGE_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif", "BMP": ".bmp", "TIFF": ".tif"}
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG" # Pillow can be built without libwebp
 
 class ImageService:
-    def __init__(self):
-        self.upload_dir = "grape_monitoring_system/data/uploads"
+    def __init__(self, upload_dir: str = UPLOAD_DIR, process_pool: bool = IMAGE_PROCESS_POOL_ENABLED):
+        """
+        With process_pool, decoding, resizing, encoding and perceptual hashing run in the shared
+        ImageProcessPool (services/image_pool.py) instead of the calling thread.
+        """
+        self.upload_dir = upload_dir
+        self.process_pool = get_image_process_pool() if process_pool else None
+        self.thumbnail_dir = os.path.join(upload_dir, "thumbs")
         os.makedirs(self.upload_dir, exist_ok=True)
+        self._thumbnail_cache = OrderedDict() # image_path -> thumbnail bytes, least recently used first
+        self._thumbnail_lock = threading.Lock()
 
     def save_image(self, image_data: bytes, filename: str) -> str:
         """
-        Saves image data to the uploads directory.
-        Returns the path to the saved image.
+        Saves image data to the content-addressed store and returns its path,
+        <upload_dir>/ab/cd/<sha256>.<ext>. Identical images are stored once; analyses rows
+        that point at the same path are counted in image_refs.
+        filename is only used for the extension when the format can't be detected.
         """
-        filepath = os.path.join(self.upload_dir, filename)
-        with open(filepath, "wb") as f:
-            f.write(image_data)
+        digest = hashlib.sha256(image_data).hexdigest()
+        filepath = self.image_path_for(digest, self._extension(image_data, filename))
+        try:
+            os.utime(filepath) # Already stored: a fresh mtime keeps the storage cleanup away from it
+        except FileNotFoundError:
+            self._write_atomically(filepath, image_data)
+        if not os.path.exists(self.thumbnail_path_for(digest)):
+            try:
+                self._write_thumbnail(digest, image_data)
+            except Exception as e:
+                print(f"Error creating thumbnail for {filepath}: {e}") # get_thumbnail retries later
         return filepath
 
+    def get_thumbnail(self, image_path: str) -> Optional[bytes]:
+        """
+        Returns THUMBNAIL_SIZE thumbnail bytes for a stored image, or None if the image is missing.
+        Served from an in-process LRU, then the thumbs directory; images saved before thumbnails
+        existed (or legacy uploads) get theirs generated and written on first use.
+        """
+        with self._thumbnail_lock:
+            thumbnail = self._thumbnail_cache.get(image_path)
+            if thumbnail is not None:
+                self._thumbnail_cache.move_to_end(image_path)
+                return thumbnail
+        try:
+            thumbnail = self._load_thumbnail(image_path)
+        except Exception as e:
+            print(f"Error loading thumbnail for {image_path}: {e}")
+            return None
+        if thumbnail is not None:
+            with self._thumbnail_lock:
+                self._thumbnail_cache[image_path] = thumbnail
+                self._thumbnail_cache.move_to_end(image_path)
+                while len(self._thumbnail_cache) > THUMBNAIL_CACHE_MAX_ENTRIES:
+                    self._thumbnail_cache.popitem(last=False)
+        return thumbnail
+
+    def thumbnail_path_for(self, digest: str) -> str:
+        return "/".join([self.thumbnail_dir.replace(os.sep, "/"), *self._shards(digest), digest + IMAGE_EXTENSIONS[THUMBNAIL_FORMAT]])
+
+    def _load_thumbnail(self, image_path: str) -> Optional[bytes]:
+        local_path = image_path.replace("\\", "/") # Paths saved on Windows
+        image_data = None
+        if self.is_stored_path(local_path):
+            digest = os.path.splitext(os.path.basename(local_path))[0] # The file name is the content hash
+        elif os.path.isfile(local_path):
+            with open(local_path, "rb") as f:
+                image_data = f.read()
+            digest = hashlib.sha256(image_data).hexdigest() # Legacy upload: hash its content
+        else:
+            return None
+        thumbnail_path = self.thumbnail_path_for(digest)
+        if os.path.exists(thumbnail_path):
+            with open(thumbnail_path, "rb") as f:
+                return f.read()
+        if image_data is None:
+            if not os.path.isfile(local_path):
+                return None
+            with open(local_path, "rb") as f:
+                image_data = f.read()
+        return self._write_thumbnail(digest, image_data)
+
+    def _write_thumbnail(self, digest: str, image_data: bytes) -> bytes:
+        thumbnail = self._preprocess(image_data, THUMBNAIL_SIZE, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY)
+        self._write_atomically(self.thumbnail_path_for(digest), thumbnail)
+        return thumbnail
+
+    def _write_atomically(self, filepath: str, data: bytes) -> None:
+        directory = os.path.dirname(filepath)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file in the same directory and rename it into place, so readers never
+        # see a partial file; concurrent saves of the same image just replace it with identical bytes
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, filepath)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def stored_path_for(self, image_data: bytes, filename: str) -> str:
+        """
+        The store path save_image uses for image_data, without writing anything.
+        """
+        return self.image_path_for(hashlib.sha256(image_data).hexdigest(), self._extension(image_data, filename))
+
+    def image_path_for(self, digest: str, extension: str) -> str:
+        # Forward slashes on every platform: the path is stored in analyses.image_path
+        return "/".join([self.upload_dir.replace(os.sep, "/"), *self._shards(digest), digest + extension])
+
+    def _shards(self, digest: str) -> list:
+        return [digest[2 * level:2 * level + 2] for level in range(IMAGE_STORE_SHARD_LEVELS)]
+
+    def is_stored_path(self, image_path: str) -> bool:
+        """
+        True if image_path points into the content-addressed store (as opposed to a legacy flat upload).
+        """
+        prefix = self.upload_dir.replace(os.sep, "/") + "/"
+        normalized = image_path.replace("\\", "/")
+        if not normalized.startswith(prefix):
+            return False
+        *shards, name = normalized[len(prefix):].split("/")
+        digest = os.path.splitext(name)[0]
+        return (len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+                and shards == self._shards(digest))
+
+    def _extension(self, image_data: bytes, filename: str) -> str:
+        try:
+            image_format = Image.open(io.BytesIO(image_data)).format # Reads the header only
+        except Exception:
+            image_format = None
+        if image_format in IMAGE_EXTENSIONS:
+            return IMAGE_EXTENSIONS[image_format]
+        return (os.path.splitext(filename or "")[1].lower() or ".bin")
+
     def get_image_bytes(self, image_path: str) -> bytes:
         """
         Reads image from a given path and returns its bytes.
@@ -24,6 +161,39 @@ class ImageService:
         with open(image_path, "rb") as f:
             return f.read()
 
+    def preprocess(self, image_source: Union[bytes, BinaryIO], mime_type: str, max_size=(1024, 1024), target_format: str = "JPEG") -> tuple[bytes, str]:
+        """
+        Resizes, converts and encodes an image in a single decode/encode pass.
+        image_source may be bytes or a binary file object (an upload or an open file), which is
+        decoded in place rather than read into memory first.
+        Returns the processed image bytes and their mime type. These are the only copy the rest of
+        the pipeline needs: they are stored, hashed and sent to Gemini as they are.
+        """
+        try:
+            processed = self._preprocess(image_source, max_size, target_format)
+            Image.init() # Image.MIME is filled in as plugins load; with the pool nothing was decoded in this process
+            return processed, Image.MIME[target_format]
+        except Exception as e:
+            print(f"Error preprocessing image: {e}")
+            # Return original if preprocessing fails
+            if isinstance(image_source, bytes):
+                return image_source, mime_type
+            image_source.seek(0)
+            return image_source.read(), mime_type
+
+    def perceptual_hash(self, image_data: bytes) -> int:
+        """
+        compute_dhash of the image, in the process pool when it is enabled.
+        """
+        if self.process_pool is None:
+            return compute_dhash(image_data)
+        return self.process_pool.run(dhash_in_worker, image_data)
+
+    def _preprocess(self, image_source: Union[bytes, BinaryIO], max_size: tuple[int, int], target_format: str, quality: int = 75) -> bytes:
+        if self.process_pool is None:
+            return preprocess_image(image_source, max_size=max_size, target_format=target_format, quality=quality)
+        return self.process_pool.run(preprocess_in_worker, self.process_pool.picklable_source(image_source), max_size, target_format, quality)
+
     def resize_image(self, image_data: bytes, max_size=(1024, 1024)) -> bytes:
         """
         Resizes an image if it exceeds max_size, maintaining aspect ratio.
@@ -0,0 +1,244 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Iterator
+from config.settings import (
+    IMAGE_STORE_SHARD_LEVELS, STORAGE_GC_GRACE_SECONDS, STORAGE_GC_BATCH_SIZE, STORAGE_GC_QUARANTINE,
+    STORAGE_GC_QUARANTINE_RETENTION_SECONDS
+)
+from services.cache_service import CacheService
+from services.database_service import DatabaseService
+from services.image_service import ImageService
+
+class StorageGarbageCollector:
+    """
+    Reconciles the upload store with image_refs and removes (or quarantines) files no analysis uses.
+
+    released images -> image_refs rows at ref_count 0 past the grace period: the file and its
+                       thumbnail go, then the row
+    store scan      -> walks the shard directories in order for files with no image_refs row at all
+                       (uploads whose analysis failed, unreferenced legacy uploads, leftover temp files)
+                       and thumbnails whose image is gone
+
+    Both work in batches. The scan position is checkpointed after every batch, so a run can stop
+    anywhere and the next one continues from there. Files modified within the grace period are never touched.
+    """
+    CHECKPOINT_KEY = "scan_checkpoint"
+
+    def __init__(self, db_service: DatabaseService, image_service: ImageService, grace_seconds: float = STORAGE_GC_GRACE_SECONDS,
+                 batch_size: int = STORAGE_GC_BATCH_SIZE, quarantine: bool = STORAGE_GC_QUARANTINE, dry_run: bool = False,
+                 pause_seconds: float = 0.0):
+        self.db_service = db_service
+        self.image_service = image_service
+        self.grace_seconds = grace_seconds
+        self.batch_size = batch_size
+        self.quarantine = quarantine
+        self.dry_run = dry_run
+        self.pause_seconds = pause_seconds # Sleep between batches to leave I/O for the app
+        self.upload_dir = image_service.upload_dir.replace(os.sep, "/")
+        self.quarantine_dir = f"{self.upload_dir}/quarantine"
+        self.checkpoints = CacheService("storage_gc", db_path=db_service.db_path)
+        self.stats = dict.fromkeys(("released_checked", "files_scanned", "orphans", "deleted_bytes", "quarantined_bytes", "refs_forgotten", "purged_bytes"), 0)
+
+    def run(self, max_batches: Optional[int] = None) -> dict:
+        """
+        One maintenance run: released images first, then up to max_batches batches of the store scan.
+        Returns the counters of this run.
+        """
+        self.collect_released(max_batches)
+        self.scan_store(max_batches)
+        return self.stats
+
+    def collect_released(self, max_batches: Optional[int] = None) -> None:
+        released_before = datetime.utcnow() - timedelta(seconds=self.grace_seconds) # released_at is UTC (CURRENT_TIMESTAMP)
+        after_path = ""
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            image_paths = self.db_service.get_released_images(released_before, self.batch_size, after_path)
+            if not image_paths:
+                break
+            after_path = image_paths[-1]
+            for image_path in image_paths:
+                self.stats["released_checked"] += 1
+                local_path = image_path.replace("\\", "/") # Paths saved on Windows
+                if self._recently_modified(local_path):
+                    continue # Saved again (deduplicated upload) while it was unreferenced
+                if self.dry_run:
+                    self._count_orphan(local_path)
+                    continue
+                # Row first: if an analysis picked the image up again in the meantime, the row stays and so does the file
+                if not self.db_service.forget_image_ref(image_path):
+                    continue
+                self.stats["refs_forgotten"] += 1
+                self._remove(local_path)
+                if self.image_service.is_stored_path(local_path):
+                    self._remove(self.image_service.thumbnail_path_for(os.path.splitext(os.path.basename(local_path))[0]))
+            batches += 1
+            self._pause()
+
+    def scan_store(self, max_batches: Optional[int] = None) -> bool:
+        """
+        Continues the store scan from the saved checkpoint. Returns True when it reached the end of the
+        store (the next scan starts over), False when it stopped after max_batches batches.
+        """
+        checkpoint = self.checkpoints.get(self.CHECKPOINT_KEY)
+        files_in_batch = batches = 0
+        for shard in self._shard_directories(checkpoint):
+            files_in_batch += self._scan_shard(shard)
+            if files_in_batch >= self.batch_size:
+                if not self.dry_run:
+                    self.checkpoints.set(self.CHECKPOINT_KEY, shard)
+                files_in_batch = 0
+                batches += 1
+                if max_batches is not None and batches >= max_batches:
+                    return False
+                self._pause()
+        if not self.dry_run:
+            self.checkpoints.delete(self.CHECKPOINT_KEY)
+        return True
+
+    def purge_quarantine(self, retention_seconds: float = STORAGE_GC_QUARANTINE_RETENTION_SECONDS) -> None:
+        """
+        Deletes quarantined files that have been there longer than retention_seconds.
+        """
+        cutoff = time.time() - retention_seconds
+        for directory, _, filenames in os.walk(self.quarantine_dir):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime <= cutoff:
+                        if not self.dry_run:
+                            os.remove(path)
+                        self.stats["purged_bytes"] += stat.st_size
+                except FileNotFoundError:
+                    pass
+
+    def reset_checkpoint(self) -> None:
+        self.checkpoints.delete(self.CHECKPOINT_KEY)
+
+    def _shard_directories(self, checkpoint: Optional[str]) -> Iterator[str]:
+        """
+        Shard directories ('ab/cd') after checkpoint in sorted order, from the store and the thumbnails.
+        With no checkpoint the upload root comes first (''), for legacy flat uploads.
+        """
+        if checkpoint is None:
+            yield ""
+            checkpoint = ""
+        yield from self._walk_shards("", 1, checkpoint)
+
+    def _walk_shards(self, relative: str, level: int, checkpoint: str) -> Iterator[str]:
+        names = set()
+        for root in (self.upload_dir, self.image_service.thumbnail_dir):
+            directory = os.path.join(root, relative)
+            if os.path.isdir(directory):
+                names.update(entry.name for entry in os.scandir(directory) if entry.is_dir() and self._is_shard_name(entry.name))
+        for name in sorted(names):
+            child = f"{relative}/{name}" if relative else name
+            if child < checkpoint[:len(child)]:
+                continue # Whole subtree already scanned
+            if level == IMAGE_STORE_SHARD_LEVELS:
+                if child > checkpoint:
+                    yield child
+            else:
+                yield from self._walk_shards(child, level + 1, checkpoint)
+
+    def _is_shard_name(self, name: str) -> bool:
+        return len(name) == 2 and all(c in "0123456789abcdef" for c in name)
+
+    def _scan_shard(self, shard: str) -> int:
+        """
+        Removes the orphans in one shard directory (and its thumbnails). Returns the number of files looked at.
+        """
+        store_dir = f"{self.upload_dir}/{shard}" if shard else self.upload_dir
+        stored = self._list_files(store_dir)
+        thumbnails = self._list_files(f"{self.image_service.thumbnail_dir.replace(os.sep, '/')}/{shard}") if shard else []
+        self.stats["files_scanned"] += len(stored) + len(thumbnails)
+
+        candidates = []
+        for name in stored:
+            path = f"{store_dir}/{name}"
+            if name.startswith(".tmp-"):
+                if not self._recently_modified(path):
+                    self._handle_orphan(path) # Left behind by an interrupted write
+            else:
+                candidates.append(path)
+        # Any image_refs row (even at 0, see collect_released) keeps a file. Legacy uploads in the
+        # root may be referenced by paths saved on Windows ('uploads\\name.png').
+        keys = {path: [path, self._windows_path(path)] if not shard else [path] for path in candidates}
+        known = self.db_service.get_image_ref_counts([key for path_keys in keys.values() for key in path_keys])
+        stored_digests = {name.split(".")[0] for name in stored}
+        for path in candidates:
+            if not any(key in known for key in keys[path]) and not self._recently_modified(path):
+                if self._handle_orphan(path):
+                    stored_digests.discard(path.rsplit("/", 1)[1].split(".")[0])
+
+        # A thumbnail is kept while its image is in the store (not just removed above); thumbnails of
+        # legacy uploads are simply regenerated
+        for name in thumbnails:
+            path = f"{self.image_service.thumbnail_dir.replace(os.sep, '/')}/{shard}/{name}"
+            if (name.startswith(".tmp-") or name.split(".")[0] not in stored_digests) and not self._recently_modified(path):
+                self._handle_orphan(path)
+        return len(stored) + len(thumbnails)
+
+    def _windows_path(self, path: str) -> str:
+        directory, name = path.rsplit("/", 1)
+        return f"{directory}\\{name}"
+
+    def _list_files(self, directory: str) -> list:
+        try:
+            return sorted(entry.name for entry in os.scandir(directory) if entry.is_file())
+        except FileNotFoundError:
+            return []
+
+    def _handle_orphan(self, path: str) -> bool:
+        """
+        Removes (or in a dry run, counts) an orphan. Returns True if it is gone (would be gone).
+        """
+        if self.dry_run:
+            return self._count_orphan(path)
+        return self._remove(path)
+
+    def _count_orphan(self, path: str) -> bool:
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return False
+        self.stats["orphans"] += 1
+        self.stats["quarantined_bytes" if self.quarantine else "deleted_bytes"] += size
+        return True
+
+    def _remove(self, path: str) -> bool:
+        """
+        Quarantines or deletes path. Returns True if this call removed it.
+        """
+        try:
+            size = os.path.getsize(path)
+            if self._recently_modified(path):
+                return False # Checked again right before removing: a deduplicated save touches the file
+            if self.quarantine:
+                target = f"{self.quarantine_dir}/{os.path.relpath(path, self.upload_dir)}"
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+                os.utime(target) # Retention counts from the move
+                self.stats["quarantined_bytes"] += size
+            else:
+                os.remove(path)
+                self.stats["deleted_bytes"] += size
+            self.stats["orphans"] += 1
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Storage cleanup: could not remove {path}: {e}")
+            return False
+
+    def _recently_modified(self, path: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(path) < self.grace_seconds
+        except FileNotFoundError:
+            return False
+
+    def _pause(self) -> None:
+        if self.pause_seconds:
+            time.sleep(self.pause_seconds)
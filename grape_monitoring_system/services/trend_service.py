@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from services.database_service import DatabaseService
+
+class TrendService:
+    """
+    Ready-to-plot disease trend series built from the analysis_rollups table.
+    Only pre-aggregated rows are read, so the cost depends on the date range, not on the number of analyses.
+    """
+    GRANULARITY_FREQUENCIES = {"day": "D", "week": "W-MON"}
+    GROUP_COLUMNS = {"disease": "disease", "confidence_band": "confidence_band"}
+
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+
+    def get_trend_series(self, user_id: int, start_date: date, end_date: date, granularity: str = "day", group_by: str = "disease") -> pd.DataFrame:
+        """
+        Returns a DataFrame indexed by period start (every period in the range, zero-filled)
+        with one column per disease or confidence band and analysis counts as values.
+        """
+        if granularity not in self.GRANULARITY_FREQUENCIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if group_by not in self.GROUP_COLUMNS:
+            raise ValueError(f"Unknown group_by: {group_by}")
+
+        frequency = self.GRANULARITY_FREQUENCIES[granularity]
+        # Weekly rows are keyed by the Monday of their week
+        first_period = pd.Timestamp(start_date)
+        if granularity == "week":
+            first_period -= pd.Timedelta(days=first_period.weekday())
+        periods = pd.date_range(first_period, pd.Timestamp(end_date), freq=frequency)
+
+        rows = self.db_service.get_analysis_rollups(user_id, granularity, first_period.date(), end_date)
+        if not rows:
+            return pd.DataFrame(index=periods)
+
+        records = np.array(rows, dtype=object)
+        frame = pd.DataFrame({
+            "period_start": pd.to_datetime(records[:, 0]),
+            "group": records[:, 1 if group_by == "disease" else 2],
+            "analysis_count": records[:, 3].astype(np.int64),
+        })
+        series = frame.pivot_table(index="period_start", columns="group", values="analysis_count", aggfunc="sum", fill_value=0)
+        series = series.reindex(periods, fill_value=0)
+        series.columns.name = None
+        return series
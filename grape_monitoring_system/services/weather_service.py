@@ -1,26 +1,124 @@
 import requests
 import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from config.settings import (
+    WEATHER_REQUEST_TIMEOUT_SECONDS, WEATHER_CACHE_BUCKET_SECONDS, WEATHER_CACHE_MAX_STALE_SECONDS,
+    WEATHER_CACHE_MAX_ENTRIES, WEATHER_CACHE_SHARED
+)
+from services.cache_service import CacheService
+from utils.circuit_breaker import get_circuit_breaker, CircuitOpenError
 
 class WeatherService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, bucket_seconds: int = WEATHER_CACHE_BUCKET_SECONDS, max_stale_seconds: int = WEATHER_CACHE_MAX_STALE_SECONDS, shared_cache: bool = WEATHER_CACHE_SHARED):
         self.api_key = api_key
         self.base_url = "http://api.openweathermap.org/data/2.5/weather"
+        self.circuit_breaker = get_circuit_breaker("openweathermap")
+        # Weather is cached per location and time bucket: an in-process LRU in front of
+        # an optional SQLite layer that all Streamlit workers share.
+        self.bucket_seconds = bucket_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._memory_cache = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._shared_cache = CacheService("weather", ttl_seconds=bucket_seconds + max_stale_seconds) if shared_cache else None
+        self._refreshing = set()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
 
     def get_current_weather(self, city: str, country_code: str = "TR") -> dict:
+        params = {
+            "q": f"{city},{country_code}",
+            "appid": self.api_key,
+            "units": "metric", # Celsius
+            "lang": "tr"       # Turkish language
+        }
+        return self._get_cached(f"city:{city.strip().lower()},{country_code.strip().upper()}", params)
+
+    def get_current_weather_by_coords(self, lat: float, lon: float) -> dict:
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "appid": self.api_key,
+            "units": "metric",
+            "lang": "tr"
+        }
+        # Two decimals is roughly 1 km, close enough to share one reading
+        return self._get_cached(f"coord:{round(lat, 2):.2f},{round(lon, 2):.2f}", params)
+
+    def _get_cached(self, location_key: str, params: dict) -> dict:
+        """
+        Fresh entry (same time bucket): returned as is.
+        Stale entry (older bucket, within max_stale_seconds): returned immediately while a
+        background refresh runs, so a slow upstream never blocks recommendations.
+        Otherwise the weather is fetched synchronously.
+        """
+        now = time.time()
+        entry = self._lookup(location_key)
+        if entry is not None:
+            if entry["bucket"] == int(now // self.bucket_seconds):
+                return entry["data"]
+            if now - entry["fetched_at"] <= self.max_stale_seconds:
+                self._refresh_in_background(location_key, params)
+                return entry["data"]
+
+        weather_data = self._fetch_and_store(location_key, params)
+        if not weather_data and entry is not None:
+            return entry["data"] # Better an old reading than none
+        return weather_data
+
+    def _lookup(self, location_key: str) -> Optional[dict]:
+        with self._memory_lock:
+            entry = self._memory_cache.get(location_key)
+            if entry is not None:
+                self._memory_cache.move_to_end(location_key)
+                return entry
+        if self._shared_cache is not None:
+            entry = self._shared_cache.get(location_key)
+            if entry is not None:
+                self._remember(location_key, entry)
+        return entry
+
+    def _remember(self, location_key: str, entry: dict) -> None:
+        with self._memory_lock:
+            self._memory_cache[location_key] = entry
+            self._memory_cache.move_to_end(location_key)
+            while len(self._memory_cache) > WEATHER_CACHE_MAX_ENTRIES:
+                self._memory_cache.popitem(last=False)
+
+    def _fetch_and_store(self, location_key: str, params: dict) -> dict:
         try:
-            params = {
-                "q": f"{city},{country_code}",
-                "appid": self.api_key,
-                "units": "metric", # Celsius
-                "lang": "tr"       # Turkish language
-            }
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-            weather_data = response.json()
-            return weather_data
-        except requests.exceptions.RequestException as e:
+            weather_data = self.circuit_breaker.call(self._fetch, params)
+        except (requests.exceptions.RequestException, CircuitOpenError) as e:
             print(f"Weather service error: {e}")
             return {}
+        now = time.time()
+        entry = {"data": weather_data, "fetched_at": now, "bucket": int(now // self.bucket_seconds)}
+        self._remember(location_key, entry)
+        if self._shared_cache is not None:
+            self._shared_cache.set(location_key, entry)
+        return weather_data
+
+    def _refresh_in_background(self, location_key: str, params: dict) -> None:
+        with self._memory_lock:
+            if location_key in self._refreshing:
+                return
+            self._refreshing.add(location_key)
+
+        def refresh():
+            try:
+                self._fetch_and_store(location_key, params)
+            finally:
+                with self._memory_lock:
+                    self._refreshing.discard(location_key)
+
+        self._refresh_executor.submit(refresh)
+
+    def _fetch(self, params: dict) -> dict:
+        response = requests.get(self.base_url, params=params, timeout=WEATHER_REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+        return response.json()
 
     def parse_weather_data(self, weather_data: dict) -> str:
         if not weather_data:
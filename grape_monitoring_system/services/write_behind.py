@@ -0,0 +1,116 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, wait
+from typing import Callable, Any, Optional, Hashable
+from config.database import connect
+from config.settings import WRITE_BEHIND_MAX_QUEUE, WRITE_BEHIND_MAX_BATCH
+
+_STOP = object()
+
+class WriteBehindQueue:
+    """
+    Single writer thread for SQLite. Callers submit write operations and get a Future back;
+    the writer drains whatever has queued up and commits it as one transaction (group commit).
+    Each operation runs inside its own SAVEPOINT, so one failing write doesn't undo the rest of the batch.
+
+    Operations are callables taking the writer's connection and returning a value (e.g. a row id);
+    they must not commit. Futures resolve only after the batch is committed.
+    """
+    def __init__(self, db_path: str, max_queue: int = WRITE_BEHIND_MAX_QUEUE, max_batch: int = WRITE_BEHIND_MAX_BATCH):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue) # Bounded: submitters block when the writer falls behind
+        self._latest_by_session = {}
+        self._latest_lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.writes = 0
+        self._thread = threading.Thread(target=self._run, name="sqlite-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation: Callable[[sqlite3.Connection], Any], session_key: Optional[Hashable] = None) -> Future:
+        if self._closed:
+            raise RuntimeError("WriteBehindQueue is closed.")
+        future = Future()
+        if session_key is not None:
+            with self._latest_lock:
+                self._latest_by_session[session_key] = future
+            future.add_done_callback(lambda done: self._forget(session_key, done))
+        self._queue.put((operation, future))
+        return future
+
+    def barrier(self, session_key: Optional[Hashable]) -> None:
+        """
+        Blocks until every write submitted under session_key is committed (read-your-writes).
+        Writes are applied in order, so waiting for the latest one is enough.
+        """
+        if session_key is None:
+            return
+        with self._latest_lock:
+            latest = self._latest_by_session.get(session_key)
+        if latest is not None:
+            wait([latest])
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops accepting writes, flushes everything already queued and stops the writer thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+
+    def _forget(self, session_key: Hashable, future: Future) -> None:
+        with self._latest_lock:
+            if self._latest_by_session.get(session_key) is future:
+                del self._latest_by_session[session_key]
+
+    def _run(self) -> None:
+        conn = connect(self.db_path)
+        conn.isolation_level = None # Transactions are managed explicitly below
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Whatever queued up while the previous batch was committing goes into this one
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if any(operation is _STOP for operation, _ in batch):
+                stopping = True
+                batch = [item for item in batch if item[0] is not _STOP]
+            if batch:
+                self._write_batch(conn, batch)
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, future in batch:
+                conn.execute("SAVEPOINT write_behind_item")
+                try:
+                    results.append((future, operation(conn), None))
+                    conn.execute("RELEASE write_behind_item")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_behind_item")
+                    conn.execute("RELEASE write_behind_item")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            print(f"Write-behind batch of {len(batch)} failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
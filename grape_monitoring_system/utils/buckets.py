@@ -0,0 +1,45 @@
+from typing import Optional
+
+# Upper bounds (exclusive) of the confidence bands; scores at or above the last bound are 'high'
+CONFIDENCE_BAND_BOUNDS = [(0.5, "low"), (0.8, "medium")]
+
+def normalize_disease(disease: Optional[str]) -> str:
+    """
+    Case- and whitespace-insensitive form of a disease name, e.g. ' Powdery  mildew' -> 'powdery mildew'.
+    """
+    if not disease:
+        return "unknown"
+    return " ".join(disease.split()).casefold()
+
+def confidence_band(score: Optional[float]) -> str:
+    """
+    Maps a 0.0-1.0 confidence score to 'low', 'medium' or 'high' ('unknown' if missing).
+    """
+    if score is None:
+        return "unknown"
+    for upper_bound, band in CONFIDENCE_BAND_BOUNDS:
+        if score < upper_bound:
+            return band
+    return "high"
+
+def confidence_band_sql(column: str) -> str:
+    """
+    SQL CASE expression equivalent to confidence_band(), for use in queries and triggers.
+    """
+    whens = " ".join(f"WHEN {column} < {upper_bound} THEN '{band}'" for upper_bound, band in CONFIDENCE_BAND_BOUNDS)
+    return f"(CASE WHEN {column} IS NULL THEN 'unknown' {whens} ELSE 'high' END)"
+
+def weather_bucket(weather_data: Optional[dict]) -> str:
+    """
+    Coarse weather class from an OpenWeatherMap response: condition, 5 °C temperature and 20 % humidity steps.
+    Readings in the same bucket lead to the same advice.
+    """
+    if not weather_data:
+        return "unknown"
+    condition = (weather_data.get('weather') or [{}])[0].get('main', 'unknown').lower()
+    main = weather_data.get('main', {})
+    temperature = main.get('temp')
+    humidity = main.get('humidity')
+    temperature_band = f"t{int(temperature // 5) * 5}" if isinstance(temperature, (int, float)) else "t?"
+    humidity_band = f"h{int(humidity // 20) * 20}" if isinstance(humidity, (int, float)) else "h?"
+    return f"{condition}|{temperature_band}|{humidity_band}"
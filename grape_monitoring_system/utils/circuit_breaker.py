@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Any, Awaitable, Optional
+import requests
+from config.settings import CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RECOVERY_SECONDS
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an external service whose circuit is open.
+    """
+    pass
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    """
+    Extracts an HTTP status code from google.api_core or requests exceptions, if there is one.
+    """
+    code = getattr(error, 'code', None)
+    if code is None and getattr(error, 'response', None) is not None:
+        code = getattr(error.response, 'status_code', None)
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+def is_service_failure(error: BaseException) -> bool:
+    """
+    True for errors that say the service is unhealthy: timeouts, connection errors, 429 and 5xx.
+    Client errors (a rejected image, an unknown city) are the request's fault and don't count.
+    """
+    status_code = get_status_code(error)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError,
+                              requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+class CircuitBreaker:
+    """
+    Stops calling an external service after repeated failures.
+    Only errors is_failure accepts count; others propagate without affecting the circuit.
+
+    closed    -> calls go through; failure_threshold consecutive failures open the circuit
+    open      -> calls fail immediately with CircuitOpenError for recovery_timeout seconds
+    half_open -> one probe call is let through; success closes the circuit, failure re-opens it
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD, recovery_timeout: float = CIRCUIT_BREAKER_RECOVERY_SECONDS,
+                 is_failure: Callable[[BaseException], bool] = is_service_failure):
+        self.name = name
+        self.is_failure = is_failure
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"Circuit '{self.name}' closed.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"Circuit '{self.name}' opened after {self._failures} consecutive failures.")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """
+        Frees a half-open probe slot after a call that says nothing about the service's health.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open), failing fast.")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open), failing fast.")
+        try:
+            result = await coro_factory()
+        except asyncio.CancelledError:
+            # Cancellation is not the service's fault, but it must free a half-open probe slot
+            self.release_probe()
+            raise
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    Returns the process-wide breaker for an external service, creating it on first use.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
@@ -0,0 +1,61 @@
+import zlib
+from typing import Optional, Union
+from config.settings import TEXT_COMPRESSION_LEVEL, TEXT_COMPRESSION_MIN_BYTES
+
+# Preset dictionary for raw Gemini analysis responses. zlib can back-reference it from the first byte,
+# which is where most of the gain on short (0.5-2 KB) responses comes from: the JSON skeleton the
+# prompt asks for and the vocabulary that keeps coming back. zlib favours matches near the end,
+# so the most common strings go last.
+GEMINI_RESPONSE_DICTIONARY_V1 = (
+    "Grapevine Leaf Blight Isariopsis Leaf Spot Phomopsis cane and leaf spot Anthracnose Eutypa dieback "
+    "Esca (Black Measles) Grapevine red blotch-associated virus Leafroll virus Crown gall Pierce's disease "
+    "Botrytis cinerea Erysiphe necator Plasmopara viticola Guignardia bidwellii Uncinula necator "
+    "Yaprak yanıklığı Kurşuni küf Mildiyö Külleme Kara çürüklük Sağlıklı Hastalık belirtisi tespit edilmedi. "
+    "Üzüm bitkisinde herhangi bir hastalık belirtisi veya sağlık sorunu tespit edilmemiştir. Bitki genel olarak sağlıklı görünmektedir. "
+    "Bitkinin genel sağlığını korumak için düzenli bakım ve gözlem yapmaya devam edin. "
+    "potassium bicarbonate, neem oil, sulfur, copper-based fungicide, mancozeb, captan, according to product instructions. "
+    "Remove and destroy affected leaves to prevent spread. Improve air circulation by pruning dense foliage. "
+    "Avoid overhead watering to reduce humidity. Apply a fungicidal spray Monitor the vines regularly for "
+    "High humidity, poor air circulation, and moderate temperatures (20-25°C) are favorable conditions for "
+    "extended periods of wet weather (rain, fog, dew), insect damage, sunburn, hail, dense canopies "
+    "characteristic symptoms lesions on the leaves, berries, shoots and stems, discoloration, shriveling, "
+    "yellowing, brown spots, powdery white, gray mold, the upper surface of the leaves, the undersides, "
+    "significant yield losses. is a fungal disease that affects grapes is caused by the fungus "
+    "The image shows a severe case of The image shows characteristic symptoms of "
+    "Powdery Mildew Downy Mildew Black Rot Botrytis Bunch Rot Healthy Unknown "
+    '```json\n{\n  "disease_detected": "",\n  "confidence_score": 0.9,\n  "explanation": "",\n  '
+    '"detailed_description": "",\n  "possible_causes": "",\n  "immediate_actions": "1. "\n}\n```'
+    '```json\n{"disease_detected": "", "confidence_score": 0.9, "explanation": "The image shows '
+    '", "detailed_description": "", "possible_causes": "", "immediate_actions": "1. Remove '
+).encode("utf-8")
+
+# Stored blobs start with the version of the dictionary they were compressed with, so the
+# dictionary can be improved later without rewriting old rows
+COMPRESSION_DICTIONARIES = {1: GEMINI_RESPONSE_DICTIONARY_V1}
+CURRENT_DICTIONARY_VERSION = 1
+
+def compress_text(text: Optional[str], level: int = TEXT_COMPRESSION_LEVEL) -> Optional[Union[str, bytes]]:
+    """
+    Compresses text into a versioned zlib blob. Short texts, and texts that would not get
+    smaller, are returned unchanged so they stay readable as plain TEXT.
+    """
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    if len(raw) < TEXT_COMPRESSION_MIN_BYTES:
+        return text
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=COMPRESSION_DICTIONARIES[CURRENT_DICTIONARY_VERSION])
+    blob = bytes([CURRENT_DICTIONARY_VERSION]) + compressor.compress(raw) + compressor.flush()
+    return blob if len(blob) < len(raw) else text
+
+def decompress_text(value: Optional[Union[str, bytes]]) -> Optional[str]:
+    """
+    Inverse of compress_text. Plain strings (uncompressed or not yet migrated rows) pass through.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    dictionary = COMPRESSION_DICTIONARIES.get(value[0])
+    if dictionary is None:
+        raise ValueError(f"Unknown compression dictionary version {value[0]}")
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=dictionary)
+    return (decompressor.decompress(value[1:]) + decompressor.flush()).decode("utf-8")
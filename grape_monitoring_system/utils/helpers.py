@@ -1,5 +1,6 @@
 import streamlit as st
 import time
+from typing import Callable, Optional
 
 def show_progress_spinner(text: str, duration: int = 2):
     """
@@ -26,3 +27,32 @@ def show_error_message(message: str):
     """
     st.error(message)
 
+def load_keyset_pages(state_key: str, fetch_page: Callable[[Optional[tuple]], tuple[list, Optional[tuple]]]) -> tuple[list, Optional[tuple]]:
+    """
+    Returns the pages of a keyset-paginated list loaded so far and the cursor after them.
+    They are kept in st.session_state[state_key], so a rerun runs no query; only the first page is
+    fetched here, further pages by load_more_button. fetch_page(cursor) must return (items, next_cursor).
+    """
+    if state_key not in st.session_state:
+        items, cursor = fetch_page(None)
+        st.session_state[state_key] = {"items": items, "cursor": cursor}
+    pages = st.session_state[state_key]
+    return pages["items"], pages["cursor"]
+
+def load_more_button(state_key: str, fetch_page: Callable[[Optional[tuple]], tuple[list, Optional[tuple]]], label: str = "Daha fazla yükle"):
+    """
+    Shows a button that fetches the page after the loaded ones (see load_keyset_pages) and reruns.
+    """
+    pages = st.session_state.get(state_key)
+    if pages is None or pages["cursor"] is None:
+        return
+    if st.button(label, key=f"{state_key}_load_more"):
+        items, cursor = fetch_page(pages["cursor"])
+        st.session_state[state_key] = {"items": pages["items"] + items, "cursor": cursor}
+        st.rerun()
+
+def reset_keyset_pages(state_key: str):
+    """
+    Drops the loaded pages; call after a write that changes the list, so the next run starts from the first page.
+    """
+    st.session_state.pop(state_key, None)
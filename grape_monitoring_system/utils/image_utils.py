@@ -1,6 +1,12 @@
 from PIL import Image
 import io
 import base64
+import threading
+from typing import BinaryIO, Union
+from config.settings import IMAGE_DECODE_CONCURRENCY
+
+# Full-size decodes are what costs memory (a 12 MP photo is ~50 MB as a bitmap), so only a few run at once
+_decode_slots = threading.BoundedSemaphore(IMAGE_DECODE_CONCURRENCY)
 
 def image_to_bytes(image: Image.Image, format: str = "JPEG") -> bytes:
     """
@@ -35,3 +41,59 @@ def decode_image_from_base64(base64_string: str) -> bytes:
     """
     return base64.b64decode(base64_string)
 
+
+def open_image(image_source: Union[bytes, BinaryIO]) -> Image.Image:
+    """
+    Opens image bytes or a binary file object (an upload, an open file) without copying it:
+    io.BytesIO shares a bytes object's buffer, and PIL pulls data from a file object as it decodes.
+    File objects are read from the start.
+    """
+    if isinstance(image_source, bytes):
+        return Image.open(io.BytesIO(image_source))
+    image_source.seek(0)
+    return Image.open(image_source)
+
+def preprocess_image(image_source: Union[bytes, BinaryIO], max_size: tuple[int, int] = (1024, 1024), target_format: str = "JPEG", quality: int = 75) -> bytes:
+    """
+    Decodes an image once, shrinks it to fit max_size, converts its mode for target_format and encodes it.
+    image_source may be bytes or a binary file object. Large JPEGs are decoded at a reduced scale
+    (draft mode) so the full-resolution bitmap is never built.
+    """
+    with _decode_slots:
+        img = open_image(image_source)
+        if img.format == 'JPEG':
+            img.draft('RGB', max_size)
+        img.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if target_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+        # JPEG has no alpha channel or palette
+        img = img.convert('RGB')
+    elif target_format == 'WEBP' and img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.mode or 'transparency' in img.info else 'RGB')
+    output_buffer = io.BytesIO()
+    if target_format in ('JPEG', 'WEBP'):
+        img.save(output_buffer, format=target_format, quality=quality)
+    else:
+        img.save(output_buffer, format=target_format)
+    return output_buffer.getvalue()
+
+def compute_dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    Computes a difference hash (dHash) of an image as a hash_size * hash_size bit integer.
+    Re-encoded, re-compressed or slightly resized copies of an image get the same or a nearby hash.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft('L', (hash_size * 4, hash_size * 4)) # Decode JPEGs at reduced scale; no-op for other formats
+    img = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = img.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """
+    Returns the number of differing bits between two perceptual hashes.
+    """
+    return (hash_a ^ hash_b).bit_count()
@@ -0,0 +1,38 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class StageTimer:
+    """
+    Records when each stage of one request starts and ends, from any thread.
+    Stages recorded on another thread than the one that created the timer are
+    marked as parallel; the rest run one after another and form the critical path.
+    """
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._owner_thread = threading.get_ident()
+        self._lock = threading.Lock()
+        self.stages = [] # (name, start offset, end offset, parallel)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def record(self, name: str, start: float, end: float) -> None:
+        parallel = threading.get_ident() != self._owner_thread
+        with self._lock:
+            self.stages.append((name, start - self._origin, end - self._origin, parallel))
+
+    def summary(self) -> str:
+        with self._lock:
+            stages = sorted(self.stages, key=lambda stage: stage[1])
+        total = max((end for _, _, end, _ in stages), default=0.0)
+        critical = sum(end - start for _, start, end, parallel in stages if not parallel)
+        lines = [f"Timing: total {total:.2f}s, critical path {critical:.2f}s"]
+        for name, start, end, parallel in stages:
+            lines.append(f"  {name:<20} {start:6.2f}s -> {end:6.2f}s  ({end - start:.2f}s){'  [parallel]' if parallel else ''}")
+        return "\n".join(lines)